@@ -0,0 +1,98 @@
+# answer_store.py
+"""
+Compact read-only store for the Q&A rows, shared between processes via mmap.
+
+File layout (little-endian):
+
+    8 bytes   magic b"QASTORE1"
+    8 bytes   uint64 row count n
+    8n bytes  int64 row ids, sorted
+    8(n+1)    uint64 question offsets into the blob
+    8(n+1)    uint64 answer offsets into the blob
+    ...       UTF-8 blob of all questions, then all answers
+"""
+import mmap
+import os
+
+import numpy as np
+
+MAGIC = b"QASTORE1"
+_HEADER = len(MAGIC) + 8
+
+
+def write_store(path, ids, questions, answers):
+    """Write rows to path atomically (temp file + rename)."""
+    ids = np.asarray(ids, dtype="<i8")
+    order = np.argsort(ids, kind="stable")
+    ids = ids[order]
+    if len(ids) and np.any(ids[1:] == ids[:-1]):
+        raise ValueError("Row ids must be unique")
+
+    question_bytes = [questions[i].encode("utf-8") for i in order]
+    answer_bytes = [answers[i].encode("utf-8") for i in order]
+    lengths = [len(b) for b in question_bytes + answer_bytes]
+    offsets = np.zeros(len(lengths) + 1, dtype="<u8")
+    np.cumsum(lengths, out=offsets[1:])
+    n = len(ids)
+    question_offsets = offsets[:n + 1]
+    answer_offsets = offsets[n:]
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(np.uint64(n).astype("<u8").tobytes())
+        f.write(ids.tobytes())
+        f.write(question_offsets.tobytes())
+        f.write(answer_offsets.tobytes())
+        for chunk in question_bytes:
+            f.write(chunk)
+        for chunk in answer_bytes:
+            f.write(chunk)
+    os.replace(tmp_path, path)
+
+
+class AnswerStore:
+    """
+    Memory-mapped reader for a store written by write_store.
+
+    The id and offset arrays are numpy views straight onto the mapping, so
+    opening the store costs no parsing and every worker process shares the
+    same page-cache pages.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not an answer store")
+        n = int(np.frombuffer(self._mm, dtype="<u8", count=1, offset=len(MAGIC))[0])
+        self.ids = np.frombuffer(self._mm, dtype="<i8", count=n, offset=_HEADER)
+        self._question_offsets = np.frombuffer(self._mm, dtype="<u8", count=n + 1, offset=_HEADER + 8 * n)
+        self._answer_offsets = np.frombuffer(self._mm, dtype="<u8", count=n + 1, offset=_HEADER + 16 * n + 8)
+        self._blob_start = _HEADER + 8 * n + 16 * (n + 1)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _position(self, row_id):
+        pos = int(np.searchsorted(self.ids, row_id))
+        if pos >= len(self.ids) or self.ids[pos] != row_id:
+            raise KeyError(row_id)
+        return pos
+
+    def _text(self, offsets, pos):
+        start = self._blob_start + int(offsets[pos])
+        end = self._blob_start + int(offsets[pos + 1])
+        return self._mm[start:end].decode("utf-8")
+
+    def question(self, row_id):
+        return self._text(self._question_offsets, self._position(row_id))
+
+    def answer(self, row_id):
+        return self._text(self._answer_offsets, self._position(row_id))
+
+    def get(self, row_id):
+        """Return (question, answer) for a row id; KeyError if unknown."""
+        pos = self._position(row_id)
+        return self._text(self._question_offsets, pos), self._text(self._answer_offsets, pos)
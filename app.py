@@ -1,30 +1,30 @@
-from flask import Flask, render_template, request, jsonify, redirect, url_for, session
-import requests
+import time
+_STARTUP_BEGAN = time.perf_counter()
+
+from flask import Flask, render_template, request, jsonify, redirect, url_for, session, Response, stream_with_context
 import json
+import logging
 import os
-from werkzeug.security import generate_password_hash, check_password_hash
-import pickle
-import faiss
-import numpy as np
-import pandas as pd
-from sentence_transformers import SentenceTransformer
-from typing import Optional, Tuple
-from transcribe import transcribe_and_save
 import uuid
-import whisper
-import torch
-import torchaudio
-from transformers import Wav2Vec2Processor, Wav2Vec2ForCTC
-# add near other imports in app.py
-
-from gtts import gTTS    # Optional: for TTS (install: pip install gTTS)
-from io import BytesIO
-from flask import send_file
-from transcribe_module import transcribe_audio
-import sentence_transformers
-
-print(sentence_transformers.__version__)
-
+from typing import Optional, Tuple
+# Heavy ML stacks (torch, whisper, faiss, sentence_transformers) are only
+# imported through the lazy components registered below
+import metrics
+from components import COMPONENTS, IMPORT_PROFILE, import_profile, readiness, register, timed_import
+from llm_client import client as llm_client, LLMBusyError
+from context_builder import RAG_CONTEXT_K, RAG_CONTEXT_TOKENS, assemble_context
+from prompts import build_prompt, generation_fields
+from user_store import AuthBusyError, UserExistsError, UserStore
+
+# LOG_LEVEL=DEBUG adds per-stage timings and retrieval details to the log
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"),
+                    format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+log = logging.getLogger("familycare")
+
+# Components that load in the background at startup; the rest load on first use
+PRELOAD_COMPONENTS = [c.strip() for c in os.getenv("FAMILYCARE_PRELOAD", "rag,asr").split(",") if c.strip()]
+# Components /readyz waits for before reporting ready
+READY_COMPONENTS = [c.strip() for c in os.getenv("FAMILYCARE_READY_REQUIRES", "rag").split(",") if c.strip()]
 
 
 app = Flask(__name__)
@@ -48,62 +48,7 @@ def is_strong_password(password: str) -> Tuple[bool, Optional[str]]:
         return False, "Password must include uppercase, lowercase, number, and special character."
     return True, None
 
-users = {}  # Temporary in-memory storage: {username: {"password_hash": str, "email": str|null, "name": str|null, "provider": "local"|"google"}}
-
-# SYSTEM_PROMPT = """
-# You are FamilyCare — an expert AI assistant specializing in family planning,
-# reproductive health, and contraceptive methods.
-
-# Your job is to answer user questions clearly, kindly, and accurately.
-
-# Rules:
-# •⁠  ⁠Focus only on family planning, contraception, sexual and reproductive health.
-# •⁠  ⁠If a question is off-topic, politely say it’s outside your scope.
-# •⁠  ⁠Use short, friendly sentences.
-# """
-
-SYSTEM_PROMPT = """
-You are *FamilyCare*, a professional AI health assistant specializing in
-family planning, reproductive health, and contraception awareness.
-
- Your purpose:
-To educate users with clear, accurate, and empathetic information about
-topics such as family planning, birth control, reproductive rights,
-maternal health, and safe sexual practices.
-
- Communication Rules:
-1. Detect the language of the user automatically.
-   - If the user writes in Nepali, respond naturally in Nepali.
-   - If the user writes in English, respond in clear and simple English.
-2. Use a warm, respectful, and supportive tone.
-3. Provide information in an *organized* and *easy-to-read* structure.
-   - Use short paragraphs or bullet points when possible.
-   - If a list of options or steps is needed, number them clearly.
-4. Focus *only* on family planning, sexual and reproductive health.
-   - If a question is unrelated, reply briefly:
-     "I'm sorry, but I can only answer questions related to family planning and reproductive health."
-5. Always ensure your answers are factually correct, responsible, and culturally sensitive.
-
- Example:
-User: What are the types of contraceptive methods?
-Answer (English):
-There are several types of contraceptive methods:
-1. Barrier methods: Condoms, diaphragms.
-2. Hormonal methods: Pills, injections, implants.
-3. Intrauterine devices (IUDs): Inserted into the uterus.
-4. Natural methods: Calendar or fertility tracking.
-5. Permanent methods: Vasectomy or tubal ligation.
-
-User: परिवार नियोजनका उपायहरू के के हुन्?
-Answer (Nepali):
-परिवार नियोजनका मुख्य उपायहरू यस प्रकार छन्:
-1. अवरोधक उपाय: कण्डम, डायाफ्राम।
-2. हर्मोनल उपाय: पिल, इन्जेक्सन, इम्प्लान्ट।
-3. आईयूडी: गर्भाशयमा राखिने सानो उपकरण।
-4. स्वाभाविक उपाय: महिनावारीको समय मिलाएर सम्बन्ध राख्ने।
-5. स्थायी उपाय: नसबन्दी (पुरुष वा महिला)।
-"""
-
+user_store = UserStore()  # SQLite; shared by every worker process
 
 
 @app.route('/')
@@ -115,6 +60,7 @@ def index():
 def chat():
     if 'user' not in session:
         return redirect(url_for('login'))
+    _conversation_id()
     return render_template('chat.html', username=session.get('user'))
 
 
@@ -127,20 +73,19 @@ def signup():
         username = request.form['username']
         password = request.form['password']
 
-        if username in users:
+        if user_store.exists(username):
             return render_template('signup.html', error="Username already exists!")
 
         ok, msg = is_strong_password(password)
         if not ok:
             return render_template('signup.html', error=msg)
 
-        password_hash = generate_password_hash(password)
-        users[username] = {
-            "password_hash": password_hash,
-            "email": None,
-            "name": username,
-            "provider": "local"
-        }
+        try:
+            user_store.create_local(username, password)
+        except UserExistsError:
+            return render_template('signup.html', error="Username already exists!")
+        except AuthBusyError:
+            return render_template('signup.html', error="Too many sign-ups right now, please try again shortly."), 503
         return redirect(url_for('login'))
     return render_template('signup.html')
 
@@ -154,8 +99,11 @@ def login():
         username = request.form['username']
         password = request.form['password']
 
-        user_record = users.get(username)
-        if user_record and user_record.get("password_hash") and check_password_hash(user_record["password_hash"], password):
+        try:
+            user_record = user_store.authenticate(username, password)
+        except AuthBusyError:
+            return render_template('login.html', error="Too many sign-ins right now, please try again shortly."), 503
+        if user_record:
             session['user'] = username
             session['email'] = user_record.get("email")
             session['name'] = user_record.get("name") or username
@@ -171,6 +119,7 @@ def logout():
     session.pop('email', None)
     session.pop('name', None)
     session.pop('provider', None)
+    conversations.forget(session.pop('conversation_id', None))
     return redirect(url_for('index'))
 
 
@@ -217,21 +166,10 @@ try:
 
         email = userinfo.get('email')
         name = userinfo.get('name') or (userinfo.get('given_name') or '')
-        # Store or update in-memory user
-        username = email or name or 'google_user'
-        if username not in users:
-            users[username] = {
-                "password_hash": None,
-                "email": email,
-                "name": name or username,
-                "provider": "google"
-            }
-        else:
-            users[username].update({
-                "email": email,
-                "name": name or username,
-                "provider": "google"
-            })
+        # Store or update the user, keeping the account already linked to this email
+        existing = user_store.get_by_email(email)
+        username = existing["username"] if existing else (email or name or 'google_user')
+        user_store.upsert_google(username, email, name or username)
 
         session['user'] = username
         session['email'] = email
@@ -246,7 +184,8 @@ except Exception as _e:
 @app.context_processor
 def inject_auth_flags():
     return {
-        'google_oauth_enabled': app.config.get('GOOGLE_OAUTH_ENABLED', False)
+        'google_oauth_enabled': app.config.get('GOOGLE_OAUTH_ENABLED', False),
+        'voice_streaming_enabled': app.config.get('VOICE_STREAMING_ENABLED', False)
     }
 
 
@@ -296,99 +235,122 @@ def inject_auth_flags():
 #     return jsonify({'response': bot_reply})
 
 
-def _build_bot_reply(user_message: str) -> str:
+def _reply_language(user_message: str, language_hint: Optional[str] = None) -> str:
     """
-    Shared helper to generate chatbot replies for both text and voice inputs.
+    Pick the language namespace for a message: Devanagari text is Nepali,
+    otherwise trust the language the client selected.
     """
-    # --- Step 1: Get RAG answer
-    context, score = rag_answer(user_message)
-    print(f"[DEBUG] RAG context: {context} | similarity score: {score}")
-
-    if score < 0.40:
-        context = ""
-
-    # --- Step 2: Build prompt for Ollama
-    prompt = f"""
-{SYSTEM_PROMPT}
-
-User question: {user_message}
-
-Relevant context from database:
-{context}
-
-You are *FamilyCare*, a professional AI health assistant specializing in
-family planning, reproductive health, and contraception awareness.
-
- Your purpose:
-To educate users with clear, accurate, and empathetic information about
-topics such as family planning, birth control, reproductive rights,
-maternal health, and safe sexual practices.
-
- Communication Rules:
-1. Detect the language of the user automatically.
-   - If the user writes in Nepali, respond naturally in Nepali.
-   - If the user writes in English, respond in clear and simple English.
-2. Use a warm, respectful, and supportive tone.
-3. Provide information in an *organized* and *easy-to-read* structure.
-   - Use short paragraphs or bullet points when possible.
-   - If a list of options or steps is needed, number them clearly.
-4. Focus *only* on family planning, sexual and reproductive health.
-   - If a question is unrelated, reply briefly:
-     "I'm sorry, but I can only answer questions related to family planning and reproductive health."
-5. Always ensure your answers are factually correct, responsible, and culturally sensitive.
-
- Example:
-User: What are the types of contraceptive methods?
-Answer (English):
-There are several types of contraceptive methods:
-1. Barrier methods: Condoms, diaphragms.
-2. Hormonal methods: Pills, injections, implants.
-3. Intrauterine devices (IUDs): Inserted into the uterus.
-4. Natural methods: Calendar or fertility tracking.
-5. Permanent methods: Vasectomy or tubal ligation.
-
-User: परिवार नियोजनका उपायहरू के के हुन्?
-Answer (Nepali):
-परिवार नियोजनका मुख्य उपायहरू यस प्रकार छन्:
-1. अवरोधक उपाय: कण्डम, डायाफ्राम।
-2. हर्मोनल उपाय: पिल, इन्जेक्सन, इम्प्लान्ट।
-3. आईयूडी: गर्भाशयमा राखिने सानो उपकरण।
-4. स्वाभाविक उपाय: महिनावारीको समय मिलाएर सम्बन्ध राख्ने।
-5. स्थायी उपाय: नसबन्दी (पुरुष वा महिला)।
-"""
+    if any('\u0900' <= ch <= '\u097f' for ch in user_message):
+        return "nepali"
+    if language_hint and language_hint.lower() in ("nepali", "ne"):
+        return "nepali"
+    return "english"
 
-    try:
-        response = requests.post(
-            "http://localhost:11434/api/generate",
-            json={
-                "model": "mistral:latest",
-                "prompt": prompt,
-                "max_tokens": 300
-            },
-            stream=True,
-            timeout=120
-        )
-        response.raise_for_status()
-    except Exception as ollama_error:
-        print("Ollama request failed:", ollama_error)
-        return "There was an issue connecting to the AI engine. Please ensure Ollama is running."
-
-    full_text = ""
-    print("\n[DEBUG] Ollama raw lines:")
-    for line in response.iter_lines():
-        print("RAW:", line)
-        if not line:
-            continue
-        try:
-            chunk = json.loads(line.decode("utf-8"))
-            print("PARSED:", chunk)
-            full_text += chunk.get("response", "")
-        except json.JSONDecodeError as decode_error:
-            print("JSON decode error:", decode_error)
 
+def _stream_bot_reply(user_message: str, language: Optional[str] = None,
+                      conversation_id: Optional[str] = None):
+    """
+    Generate the chatbot reply for a message, yielding text fragments
+    as soon as Ollama produces them. With a conversation_id the reply
+    follows on from the earlier turns of that conversation.
+    """
+    # --- Curated questions from chatbot_data.json need no retrieval or LLM
+    namespace = _reply_language(user_message, language)
+    curated = intent_matcher.match(user_message, namespace)
+    if curated is not None:
+        # Greetings and canned answers are not part of the conversation
+        metrics.REPLIES.inc("intent")
+        yield curated["answer"]
+        return
+
+    # --- Step 0: Retrieve (one batched encode + search) and reuse a reply
+    # to a semantically equivalent question if we have one. Only a question
+    # that leans on the earlier turns ("what about its side effects?") skips
+    # the cache lookup: its reply depends on the conversation.
+    rag = rag_component.get()
+    hits, query_vec = rag.retrieve(user_message, k=RAG_CONTEXT_K)
+    follow_up = conversations.has_history(conversation_id) and depends_on_history(
+        user_message, hits[0]["score"] if hits else 0.0, rag.SCORE_CUTOFF)
+    cached_reply = None if follow_up else response_cache.lookup(namespace, user_message, query_vec)
+    if cached_reply is not None:
+        metrics.REPLIES.inc("cache")
+        conversations.record(conversation_id, user_message, cached_reply)
+        yield cached_reply
+        return
+
+    # --- Step 1: Continue the conversation's Ollama context, or compact it,
+    # and pack the relevant passages into whatever budget is left
+    plan = conversations.plan(conversation_id, user_message, RAG_CONTEXT_TOKENS)
+    context = assemble_context(hits, cutoff=rag.SCORE_CUTOFF, max_tokens=plan["reference_tokens"])
+    log.debug("RAG context: %d passages, ~%d tokens, rows %s | top score: %.3f",
+              context["passages"], context["tokens"], context["ids"], context["top_score"])
+
+    # --- Step 2: Build prompt for Ollama (fixed instructions go in the system field)
+    prompt = build_prompt(user_message, context["text"], plan["history"])
+
+    parts = []
+    produced = False
+    generation = {}
+    try:
+        for fragment in llm_client.stream(prompt, stats=generation, **generation_fields(plan["context"])):
+            produced = True
+            parts.append(fragment)
+            yield fragment
+    except LLMBusyError as busy_error:
+        log.warning("Ollama busy: %s", busy_error)
+        metrics.REPLIES.inc("busy")
+        if not produced:
+            yield "The assistant is busy right now. Please try again in a moment."
+        return
+    except Exception:
+        log.exception("Ollama request failed")
+        metrics.REPLIES.inc("error")
+        if not produced:
+            yield "There was an issue connecting to the AI engine. Please ensure Ollama is running."
+        return
+
+    if not produced:
+        metrics.REPLIES.inc("empty")
+        yield "Sorry, I couldn't generate a response."
+        return
+
+    metrics.REPLIES.inc("llm")
+    reply = "".join(parts).strip()
+    conversations.record(conversation_id, user_message, reply, generation.get("context"))
+    # The cache is shared between users: only a reply generated without this
+    # conversation's context or history may be served to anyone else
+    if plan["context"] is None and not plan["history"]:
+        response_cache.store(namespace, user_message, query_vec, reply)
+
+
+def _build_bot_reply(user_message: str, language: Optional[str] = None,
+                     conversation_id: Optional[str] = None) -> str:
+    """
+    Shared helper to generate chatbot replies for both text and voice inputs.
+    """
+    full_text = "".join(_stream_bot_reply(user_message, language, conversation_id))
     return full_text.strip() or "Sorry, I couldn't generate a response."
 
 
+def _sse_event(payload: dict, event: Optional[str] = None) -> str:
+    """
+    Format one Server-Sent Events message.
+    """
+    head = f"event: {event}\n" if event else ""
+    return f"{head}data: {json.dumps(payload, ensure_ascii=False)}\n\n"
+
+
+def _conversation_id() -> str:
+    """The id of this browser session's conversation, created on first use."""
+    if 'conversation_id' not in session:
+        session['conversation_id'] = uuid.uuid4().hex
+    return session['conversation_id']
+
+
+def _wants_stream(data: dict) -> bool:
+    return bool(data.get('stream')) or 'text/event-stream' in request.headers.get('Accept', '')
+
+
 @app.route('/get_response', methods=['POST'])
 def get_response():
     data = request.json
@@ -399,13 +361,110 @@ def get_response():
     if not user_message:
         return jsonify({'response': 'Please enter a message.'})
 
-    bot_reply = _build_bot_reply(user_message)
+    language = data.get('language')
+    # Read before streaming starts: the session cookie goes out with the headers
+    conversation_id = _conversation_id()
+    if _wants_stream(data):
+        def generate():
+            for fragment in _stream_bot_reply(user_message, language, conversation_id):
+                yield _sse_event({'token': fragment})
+            yield _sse_event({}, event='done')
+
+        return Response(
+            stream_with_context(generate()),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+
+    bot_reply = _build_bot_reply(user_message, language, conversation_id)
     return jsonify({'response': bot_reply})
 
 
 
 #rag
-from rag_qa import rag_answer
+from conversation_memory import ConversationMemory, depends_on_history
+from intent_matcher import IntentMatcher
+from semantic_cache import SemanticCache
+
+intent_matcher = IntentMatcher.load()
+response_cache = SemanticCache()
+conversations = ConversationMemory()
+
+def _load_rag():
+    # Import the heavy dependencies one by one so the profile shows each cost
+    for dependency in ("numpy", "faiss", "torch", "sentence_transformers"):
+        timed_import(dependency)
+    return timed_import("rag_qa")
+
+
+def _load_asr():
+    # Pool workers load the speech models themselves (in thread mode, this process does)
+    asr_pool = timed_import("asr_pool")
+    return asr_pool.AsrPool(on_transcribed=_voice_reply).warm_up()
+
+
+rag_component = register("rag", _load_rag)
+asr_component = register("asr", _load_asr)
+
+
+@app.route("/healthz")
+def healthz():
+    return jsonify({"status": "ok"})
+
+
+@app.route("/readyz")
+def readyz():
+    is_ready, components = readiness(READY_COMPONENTS)
+    body = {
+        "ready": is_ready,
+        "requires": READY_COMPONENTS,
+        "components": components,
+        "import_profile": import_profile(),
+        # Under gunicorn each worker answers for itself
+        "pid": os.getpid(),
+        "memory": metrics.process_memory(),
+    }
+    return jsonify(body), (200 if is_ready else 503)
+
+def _collect_app_metrics():
+    """Gauges and counters read from the caches, intents and ASR pool at scrape time."""
+    cache = response_cache.stats()
+    intents = intent_matcher.stats()
+    samples = [
+        ("familycare_reply_cache_lookups_total", "counter", "Semantic reply cache lookups.", cache["hits"], {"result": "hit"}),
+        ("familycare_reply_cache_lookups_total", "counter", "Semantic reply cache lookups.", cache["misses"], {"result": "miss"}),
+        ("familycare_intent_lookups_total", "counter", "Curated intent lookups.", intents["hits"], {"result": "hit"}),
+        ("familycare_intent_lookups_total", "counter", "Curated intent lookups.",
+         intents["lookups"] - intents["hits"], {"result": "miss"}),
+    ]
+    samples.append(("familycare_conversations", "gauge", "Conversations held in memory.",
+                    conversations.stats()["sessions"], {}))
+    for namespace, entries in cache["entries"].items():
+        samples.append(("familycare_reply_cache_entries", "gauge", "Cached replies.", entries, {"language": namespace}))
+    for name, component in COMPONENTS.items():
+        samples.append(("familycare_component_ready", "gauge", "1 once a lazy component has loaded.",
+                        int(component.ready), {"component": name}))
+    if asr_component.ready:
+        pool = asr_component.get().stats()
+        samples.append(("familycare_asr_active_jobs", "gauge", "Voice jobs queued or running.", pool["active"], {}))
+        samples.append(("familycare_asr_queue_depth", "gauge", "Most voice jobs accepted at once.", pool["queue_depth"], {}))
+    return samples
+
+
+metrics.register_collector(_collect_app_metrics)
+
+
+@app.route("/metrics")
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+
+@app.route("/stats")
+def stats():
+    """How much traffic the curated intents and the reply cache answer without the LLM."""
+    return jsonify({"intents": intent_matcher.stats(), "reply_cache": response_cache.stats(),
+                    "conversations": conversations.stats()})
+
 
 @app.route("/ask", methods=["POST"])
 def ask():
@@ -413,46 +472,192 @@ def ask():
     if not user_question:
         return jsonify({"error": "No question provided"}), 400
     
-    answer, score = rag_answer(user_question)
-    return jsonify({"answer": answer, "score": score})
+    k = request.form.get("k", type=int) or 1
+    hits = rag_component.get().rag_search(user_question, k=max(1, min(k, 20)))
+    if not hits:
+        return jsonify({"answer": "", "score": 0.0, "hits": []})
+    return jsonify({"answer": hits[0]["answer"], "score": hits[0]["score"], "hits": hits})
+
+
+@app.route("/ask_batch", methods=["POST"])
+def ask_batch():
+    data = request.get_json(silent=True) or {}
+    questions = data.get("questions")
+    if not isinstance(questions, list) or not questions:
+        return jsonify({"error": "No questions provided"}), 400
+    if len(questions) > 256:
+        return jsonify({"error": "At most 256 questions per call"}), 400
+
+    # Like /ask: a missing or non-numeric k means 1
+    try:
+        k = int(data.get("k") or 1)
+    except (TypeError, ValueError):
+        k = 1
+    k = max(1, min(k, 20))
+    results = []
+    batch = rag_component.get().retrieve_many([str(q) for q in questions], k=k)
+    for question, (hits, _) in zip(questions, batch):
+        best = hits[0] if hits else {"answer": "", "score": 0.0}
+        results.append({"question": question, "answer": best["answer"], "score": best["score"], "hits": hits})
+    return jsonify({"results": results})
 
 
 # ====================== VOICE QUERY ENDPOINT =========================
+from asr_pool import AsrOverloadedError
 
+# Longest a single status poll may block, and how long /voice_query waits
+VOICE_MAX_WAIT = 30.0
+VOICE_SYNC_TIMEOUT = float(os.getenv("VOICE_SYNC_TIMEOUT", "180"))
 
 
-@app.route("/voice_query", methods=["POST"])
-def voice_query():
+
+def _voice_reply(job: dict) -> dict:
+    """Runs once a voice job has text: produce the chatbot reply for it."""
+    log.info("Voice job %s: language %s (confidence %.2f)", job["id"], job["language"], job["language_confidence"])
+    log.debug("Voice job %s said: %s", job["id"], job["user_text"])
+    return {"bot_reply": _build_bot_reply(job["user_text"], job["language"], job.get("conversation_id"))}
+
+
+def _submit_voice_job():
+    """
+    Queue the uploaded audio on the ASR pool.
+    Returns (job_id, None) or (None, error_response).
+    """
+    if "audio" not in request.files:
+        return None, (jsonify({"error": "No audio file received"}), 400)
+
+    audio_file = request.files["audio"]
     try:
-        if "audio" not in request.files:
-            return jsonify({"error": "No audio file received"}), 400
+        job_id = asr_component.get().submit(audio_file.read(), request.form.get("language"),
+                                            conversation_id=_conversation_id())
+    except AsrOverloadedError as busy_error:
+        log.warning("Voice queue full: %s", busy_error)
+        response = jsonify({"error": "Voice service is busy, please try again shortly"})
+        return None, (response, 503, {"Retry-After": "5"})
+    return job_id, None
 
-        audio_file = request.files["audio"]
-        temp_path = "temp_audio.webm"
-        audio_file.save(temp_path)
 
-        # --- Transcribe ---
-        transcription, lang = transcribe_audio(temp_path)
-        os.remove(temp_path)
+def _voice_job_body(job: dict) -> dict:
+    keys = ("id", "status", "user_text", "language", "language_confidence", "bot_reply", "error")
+    return {key: job.get(key) for key in keys if job.get(key) is not None}
 
-        if not transcription:
-            return jsonify({"error": "Could not transcribe audio"}), 500
 
-        print("User said:", transcription)
-        print("Language:", lang)
+@app.route("/voice_jobs", methods=["POST"])
+def create_voice_job():
+    job_id, error_response = _submit_voice_job()
+    if error_response:
+        return error_response
+    return jsonify({"job_id": job_id, "status": "queued",
+                    "status_url": url_for("voice_job_status", job_id=job_id)}), 202
 
-        # --- Get chatbot reply ---
-        bot_reply = _build_bot_reply(transcription)
 
-        return jsonify({
-            "user_text": transcription,
-            "language": lang,
-            "bot_reply": bot_reply
-        })
+@app.route("/voice_jobs/<job_id>")
+def voice_job_status(job_id):
+    # ?wait=N long-polls up to N seconds for the job to finish
+    wait = min(max(request.args.get("wait", default=0.0, type=float), 0.0), VOICE_MAX_WAIT)
+    job = asr_component.get().get(job_id, wait=wait)
+    if job is None:
+        return jsonify({"error": "Unknown job"}), 404
+    return jsonify(_voice_job_body(job))
+
+
+@app.route("/voice_query", methods=["POST"])
+def voice_query():
+    """Synchronous variant for clients that do not poll: waits for the job."""
+    job_id, error_response = _submit_voice_job()
+    if error_response:
+        return error_response
+
+    job = asr_component.get().get(job_id, wait=VOICE_SYNC_TIMEOUT)
+    if job["status"] == "error":
+        return jsonify({"error": job["error"]}), 500
+    if job["status"] != "done":
+        return jsonify({"error": "Voice processing timed out", "job_id": job_id}), 504
+    return jsonify({
+        "user_text": job["user_text"],
+        "language": job["language"],
+        "language_confidence": job["language_confidence"],
+        "bot_reply": job["bot_reply"]
+    })
+
+# ====================== STREAMING VOICE (WebSocket) ======================
+app.config['VOICE_STREAMING_ENABLED'] = False
+try:
+    from flask_sock import Sock
+    from streaming_asr import StreamingSession
+    sock = Sock(app)
+
+    @sock.route('/voice_stream')
+    def voice_stream(ws):
+        """
+        Live voice input. The client sends a JSON {"type": "start", "language": ...}
+        message, then binary 16 kHz int16 PCM chunks while the user speaks, and
+        optionally {"type": "stop"} to end the utterance early. The server sends
+        speech_start / partial / final events, then the bot reply as token events
+        followed by done.
+        """
+        pool = asr_component.get()
+        session_state = StreamingSession(pool.run_waveform)
+        # The upgrade response cannot set cookies; /chat created the id already
+        conversation_id = session.get('conversation_id')
+
+        def reply_to(final):
+            ws.send(json.dumps(final, ensure_ascii=False))
+            if not final.get("text"):
+                ws.send(json.dumps({"type": "done"}))
+                return
+            for fragment in _stream_bot_reply(final["text"], final.get("language"), conversation_id):
+                ws.send(json.dumps({"type": "token", "text": fragment}, ensure_ascii=False))
+            ws.send(json.dumps({"type": "done"}))
+
+        while True:
+            message = ws.receive(timeout=0.05)
+            try:
+                events = session_state.poll()
+                if isinstance(message, str):
+                    try:
+                        control = json.loads(message or "{}")
+                    except ValueError:
+                        control = None
+                    if not isinstance(control, dict):
+                        # Keep the stream, and any speech buffered so far
+                        ws.send(json.dumps({"type": "error", "message": "Control messages must be JSON objects"}))
+                    elif control.get("type") == "start":
+                        session_state.language_hint = control.get("language")
+                    elif control.get("type") == "stop":
+                        events.append(session_state.finish())
+                elif message:
+                    events += session_state.feed(message)
+
+                for event in events:
+                    if event["type"] == "final":
+                        reply_to(event)
+                    else:
+                        ws.send(json.dumps(event, ensure_ascii=False))
+            except AsrOverloadedError:
+                session_state.reset()
+                ws.send(json.dumps({"type": "error", "message": "Voice service is busy, please try again shortly"}))
+
+    app.config['VOICE_STREAMING_ENABLED'] = True
+except ImportError:
+    # flask-sock not installed; the chat page falls back to uploading clips.
+    pass
+
 
-    except Exception as e:
-        print("VOICE ERROR:", e)
-        return jsonify({"error": "Could not process voice message"}), 500
+# Record how long importing the app itself took, then warm heavy components
+# in the background so the first request does not pay for them
+IMPORT_PROFILE["app"] = round(time.perf_counter() - _STARTUP_BEGAN, 4)
+log.info("App imported in %.2fs", IMPORT_PROFILE["app"])
+
+# wsgi.py (gunicorn) turns this off and loads models before forking instead.
+# Under `python app.py` the debug reloader's parent process only watches
+# files; leave model loading to the child it spawns. ASR pool workers
+# re-import this file as __mp_main__ and must not start pools of their own.
+_is_reloader_parent = __name__ == '__main__' and os.environ.get('WERKZEUG_RUN_MAIN') != 'true'
+if not _is_reloader_parent and __name__ != '__mp_main__':
+    for _name in PRELOAD_COMPONENTS:
+        if _name in COMPONENTS:
+            COMPONENTS[_name].load_in_background()
 
 if __name__ == '__main__':
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,320 @@
+# asr_pool.py
+"""
+Speech-to-text off the request thread.
+
+Uploads become jobs on a pool of workers that load Whisper once at start.
+Clients get a job id straight away and poll (or long-poll) for the result.
+With ASR_JOBS_DB set, job status is also written to a SQLite file, so a
+poll answered by another pre-forked worker still finds the job.
+"""
+import json
+import logging
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import metrics
+
+log = logging.getLogger(__name__)
+
+ASR_POOL_SIZE = int(os.getenv("ASR_POOL_SIZE", "2"))
+# Jobs allowed to be queued or running at once; more are rejected
+ASR_QUEUE_DEPTH = int(os.getenv("ASR_QUEUE_DEPTH", "8"))
+# "process" isolates ASR CPU use from the web workers; "thread" shares the
+# models already loaded in this process
+ASR_EXECUTOR = os.getenv("ASR_EXECUTOR", "process")
+# torch intra-op threads per ASR worker, so the pool cannot take every core
+ASR_TORCH_THREADS = int(os.getenv("ASR_TORCH_THREADS", "2"))
+# Finished jobs are forgotten after this many seconds
+ASR_JOB_TTL = float(os.getenv("ASR_JOB_TTL", "300"))
+# SQLite file shared by the web workers for job status; empty = this process only
+ASR_JOBS_DB = os.getenv("ASR_JOBS_DB", "")
+# How often a poll for another worker's job re-reads the shared file
+_SHARED_POLL_S = 0.2
+
+
+class AsrOverloadedError(RuntimeError):
+    """Raised when the ASR queue is full."""
+
+
+def _init_worker():
+    """Load the speech models once per worker process."""
+    if not logging.getLogger().handlers:
+        # spawned workers do not inherit the web process's logging setup
+        logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
+    import torch
+    torch.set_num_threads(ASR_TORCH_THREADS)
+    import transcribe_module  # noqa: F401  (loads Whisper at import)
+
+
+def _ping():
+    return os.getpid()
+
+
+def _transcribe_job(audio_bytes, language_hint):
+    import transcribe_module
+
+    started = time.perf_counter()
+    # Stage timings come back with the result; this process is not scraped
+    with metrics.capture() as timings:
+        # Decoded in memory; the upload never touches the filesystem
+        text, language, confidence = transcribe_module.transcribe_bytes(audio_bytes, language_hint)
+    return {
+        "user_text": text,
+        "language": language,
+        "language_confidence": confidence,
+        "asr_seconds": round(time.perf_counter() - started, 3),
+        "timings": timings,
+    }
+
+
+def _transcribe_waveform_job(audio, language_hint, language):
+    import transcribe_module
+
+    started = time.perf_counter()
+    with metrics.capture() as timings:
+        text, language, confidence = transcribe_module.transcribe_waveform(audio, language_hint, language)
+    return {
+        "user_text": text,
+        "language": language,
+        "language_confidence": confidence,
+        "asr_seconds": round(time.perf_counter() - started, 3),
+        "timings": timings,
+    }
+
+
+class _SharedJobs:
+    """Job snapshots in SQLite (WAL), readable by every worker process."""
+
+    def __init__(self, path):
+        self.path = path
+        self._conn = None
+        self._pid = None
+        self._lock = threading.Lock()
+        with self._lock:
+            self._connection().execute(
+                "CREATE TABLE IF NOT EXISTS voice_jobs"
+                " (id TEXT PRIMARY KEY, body TEXT NOT NULL, finished_at REAL)")
+
+    def _connection(self):
+        """This process's connection; one opened before a fork is not reused. Caller holds the lock."""
+        if self._pid != os.getpid():
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._pid = os.getpid()
+        return self._conn
+
+    def put(self, snapshot):
+        with self._lock:
+            self._connection().execute(
+                "INSERT OR REPLACE INTO voice_jobs (id, body, finished_at) VALUES (?, ?, ?)",
+                (snapshot["id"], json.dumps(snapshot, ensure_ascii=False), snapshot.get("finished_at")))
+
+    def get(self, job_id):
+        with self._lock:
+            row = self._connection().execute("SELECT body FROM voice_jobs WHERE id = ?", (job_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def forget_finished_before(self, cutoff):
+        with self._lock:
+            self._connection().execute("DELETE FROM voice_jobs WHERE finished_at < ?", (cutoff,))
+
+
+def _snapshot(job):
+    """A JSON-safe copy of a job. Caller holds the pool's lock."""
+    return {key: value for key, value in job.items() if key != "done"}
+
+
+def _record_timings(result):
+    """Feed a worker's stage timings into this process's histograms."""
+    for stage, seconds in result.pop("timings", ()):
+        metrics.observe(stage, seconds)
+    metrics.observe("asr_total", result["asr_seconds"])
+    return result
+
+
+class AsrPool:
+    """
+    Bounded pool of ASR workers with a job registry.
+
+    on_transcribed(job) runs on a small thread pool once text is available,
+    and may return extra fields to merge into the job (e.g. bot_reply).
+    """
+
+    def __init__(self, size=ASR_POOL_SIZE, queue_depth=ASR_QUEUE_DEPTH, executor=ASR_EXECUTOR,
+                 on_transcribed=None, job_ttl=ASR_JOB_TTL, jobs_db=ASR_JOBS_DB):
+        self.size = max(1, size)
+        self.queue_depth = max(1, queue_depth)
+        self.job_ttl = job_ttl
+        self.on_transcribed = on_transcribed
+        if executor == "process":
+            # spawn: torch and forked thread pools do not mix
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.size,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+        else:
+            _init_worker()
+            self._executor = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix="asr")
+        self._followups = ThreadPoolExecutor(max_workers=self.size, thread_name_prefix="asr-reply")
+        self._jobs = {}
+        self._shared = _SharedJobs(jobs_db) if jobs_db else None
+        self._lock = threading.Lock()
+        self._active = 0
+
+    def warm_up(self):
+        """Start every worker now so the first upload does not pay model load time."""
+        for future in [self._executor.submit(_ping) for _ in range(self.size)]:
+            future.result()
+        return self
+
+    def _forget_expired(self, now):
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job["finished_at"] and now - job["finished_at"] > self.job_ttl]
+        for job_id in expired:
+            del self._jobs[job_id]
+        if self._shared:
+            try:
+                self._shared.forget_finished_before(now - self.job_ttl)
+            except sqlite3.Error:
+                log.exception("Could not prune shared voice jobs")
+
+    def submit(self, audio_bytes, language_hint=None, **fields):
+        """
+        Queue an upload for transcription and return its job id. Extra
+        fields (e.g. conversation_id) are kept on the job for on_transcribed.
+        """
+        now = time.time()
+        with self._lock:
+            self._forget_expired(now)
+            if self._active >= self.queue_depth:
+                raise AsrOverloadedError(f"{self._active} voice jobs already queued")
+            self._active += 1
+            job_id = uuid.uuid4().hex
+            job = {**fields, "id": job_id, "status": "queued", "created_at": now, "finished_at": None,
+                   "done": threading.Event()}
+            self._jobs[job_id] = job
+            snapshot = _snapshot(job)
+
+        try:
+            future = self._executor.submit(_transcribe_job, audio_bytes, language_hint)
+        except Exception:
+            with self._lock:
+                self._jobs.pop(job_id, None)
+            self._release()
+            raise
+        self._publish(snapshot)
+        future.add_done_callback(lambda f: self._transcribed(job, f))
+        return job_id
+
+    def run_waveform(self, audio, language_hint=None, language=None):
+        """
+        Transcribe a 16 kHz mono float32 array without creating a job.
+        Returns a Future of the result dict; counts against the queue depth.
+        """
+        with self._lock:
+            if self._active >= self.queue_depth:
+                raise AsrOverloadedError(f"{self._active} voice jobs already queued")
+            self._active += 1
+        try:
+            future = self._executor.submit(_transcribe_waveform_job, audio, language_hint, language)
+        except Exception:
+            self._release()
+            raise
+        future.add_done_callback(self._waveform_done)
+        return future
+
+    def _waveform_done(self, future):
+        self._release()
+        if not future.cancelled() and future.exception() is None:
+            _record_timings(future.result())
+
+    def _release(self):
+        with self._lock:
+            self._active -= 1
+
+    def _update(self, job, fields):
+        """
+        Apply fields to a job and return a snapshot taken in the same step,
+        so pollers never see it half updated.
+        """
+        with self._lock:
+            job.update(fields)
+            return _snapshot(job)
+
+    def _transcribed(self, job, future):
+        try:
+            result = _record_timings(future.result())
+        except Exception:
+            log.exception("ASR job %s failed", job["id"])
+            self._finish(job, error="Could not transcribe audio")
+            return
+        if not result.get("user_text"):
+            self._finish(job, error="Could not transcribe audio", fields=result)
+        elif self.on_transcribed is None:
+            self._finish(job, fields=result)
+        else:
+            snapshot = self._update(job, {**result, "status": "replying"})
+            self._publish(snapshot)
+            self._followups.submit(self._follow_up, job, snapshot)
+
+    def _follow_up(self, job, snapshot):
+        try:
+            fields = self.on_transcribed(dict(snapshot)) or {}
+        except Exception:
+            log.exception("Voice reply for job %s failed", job["id"])
+            self._finish(job, error="Could not process voice message")
+            return
+        self._finish(job, fields=fields)
+
+    def _finish(self, job, error=None, fields=None):
+        fields = dict(fields or {}, status="error" if error else "done", finished_at=time.time())
+        if error:
+            fields["error"] = error
+        self._publish(self._update(job, fields))
+        self._release()
+        job["done"].set()
+
+    def _publish(self, snapshot):
+        if self._shared is None:
+            return
+        try:
+            self._shared.put(snapshot)
+        except sqlite3.Error:
+            log.exception("Could not share status of voice job %s", snapshot["id"])
+
+    def get(self, job_id, wait=0.0):
+        """
+        Return a JSON-safe snapshot of a job, or None if unknown. With wait,
+        block up to that many seconds for the job to finish first.
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+        if job is None:
+            return self._get_shared(job_id, wait)
+        if wait > 0:
+            job["done"].wait(wait)
+        with self._lock:
+            return _snapshot(job)
+
+    def _get_shared(self, job_id, wait):
+        """A job submitted through another worker process, or None."""
+        if self._shared is None:
+            return None
+        deadline = time.monotonic() + wait
+        while True:
+            snapshot = self._shared.get(job_id)
+            if snapshot is None or snapshot["finished_at"] or time.monotonic() >= deadline:
+                return snapshot
+            time.sleep(_SHARED_POLL_S)
+
+    def stats(self):
+        with self._lock:
+            return {"active": self._active, "queue_depth": self.queue_depth, "workers": self.size}
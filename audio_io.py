@@ -0,0 +1,90 @@
+# audio_io.py
+"""
+Decode uploaded audio bytes to 16 kHz mono float32 in memory, once, for
+every speech model. Nothing is written to disk.
+"""
+import io
+import subprocess
+import threading
+import wave
+
+import numpy as np
+
+import metrics
+
+SAMPLE_RATE = 16000
+
+try:
+    import soundfile
+except ImportError:  # optional; ffmpeg handles every format anyway
+    soundfile = None
+
+_resamplers = {}
+_resamplers_lock = threading.Lock()
+
+
+def get_resampler(source_rate: int):
+    """torchaudio Resample transform to 16 kHz, built once per source rate."""
+    resampler = _resamplers.get(source_rate)
+    if resampler is None:
+        import torchaudio
+        with _resamplers_lock:
+            resampler = _resamplers.get(source_rate)
+            if resampler is None:
+                resampler = _resamplers[source_rate] = torchaudio.transforms.Resample(source_rate, SAMPLE_RATE)
+    return resampler
+
+
+def to_mono_16k(samples: np.ndarray, rate: int) -> np.ndarray:
+    """Mix (frames, channels) float samples to mono and resample to 16 kHz."""
+    mono = samples.mean(axis=1) if samples.ndim == 2 else samples
+    mono = np.ascontiguousarray(mono, dtype=np.float32)
+    if rate == SAMPLE_RATE:
+        return mono
+    import torch
+    with torch.no_grad():
+        return get_resampler(rate)(torch.from_numpy(mono)).numpy()
+
+
+def _decode_with_ffmpeg(data: bytes) -> np.ndarray:
+    # ffmpeg reads the upload from stdin and writes raw 16 kHz mono PCM to stdout
+    cmd = ["ffmpeg", "-nostdin", "-loglevel", "error", "-i", "pipe:0",
+           "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(SAMPLE_RATE), "pipe:1"]
+    result = subprocess.run(cmd, input=data, capture_output=True, check=False)
+    if result.returncode != 0:
+        raise RuntimeError(f"ffmpeg could not decode audio: {result.stderr.decode(errors='ignore').strip()}")
+    return np.frombuffer(result.stdout, dtype="<i2").astype(np.float32) / 32768.0
+
+
+def _decode_wav(data: bytes) -> np.ndarray:
+    with wave.open(io.BytesIO(data)) as w:
+        if w.getsampwidth() != 2:
+            raise ValueError("only 16-bit PCM WAV is handled here")
+        frames = np.frombuffer(w.readframes(w.getnframes()), dtype="<i2")
+        samples = frames.reshape(-1, w.getnchannels()).astype(np.float32) / 32768.0
+        return to_mono_16k(samples, w.getframerate())
+
+
+@metrics.timed("audio_decode")
+def decode_audio(data: bytes) -> np.ndarray:
+    """
+    Bytes of any container the browser or a recorder produces -> 16 kHz mono float32.
+
+    16-bit WAV is decoded with the standard library, FLAC/OGG with soundfile
+    when it is installed; everything else (e.g. MediaRecorder WebM/Opus) is
+    piped through ffmpeg.
+    """
+    if not data:
+        raise ValueError("Empty audio upload")
+    if data[:4] == b"RIFF" and data[8:12] == b"WAVE":
+        try:
+            return _decode_wav(data)
+        except (wave.Error, ValueError):
+            pass  # compressed or float WAV: let the other decoders try
+    if soundfile is not None:
+        try:
+            samples, rate = soundfile.read(io.BytesIO(data), dtype="float32", always_2d=True)
+            return to_mono_16k(samples, rate)
+        except Exception:
+            pass  # not a format libsndfile understands
+    return _decode_with_ffmpeg(data)
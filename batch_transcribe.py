@@ -0,0 +1,163 @@
+# batch_transcribe.py
+"""
+Offline batch transcription (e.g. recorded helpline calls).
+
+    python batch_transcribe.py calls/ --out transcripts.jsonl --workers 4
+    python batch_transcribe.py --manifest calls.txt --language ne
+
+Inputs are directories (searched recursively for audio files) and/or a
+manifest with one path per line; JSONL manifest lines may also carry a
+per-file "language" hint: {"path": "...", "language": "ne"}.
+
+Each worker process loads the models once (transcribe_module) and handles
+many files. One JSON record per file is appended to --out as soon as it is
+done, so an interrupted run resumes where it stopped: files that already
+have an "ok" record are skipped, failed ones are retried.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+AUDIO_EXTENSIONS = {".wav", ".webm", ".ogg", ".mp3", ".m4a", ".flac"}
+DEFAULT_OUT = "transcripts.jsonl"
+
+
+def find_audio(folder):
+    paths = []
+    for root, _, names in os.walk(folder):
+        paths += [os.path.join(root, name) for name in names if os.path.splitext(name)[1].lower() in AUDIO_EXTENSIONS]
+    return sorted(paths)
+
+
+def read_manifest(path):
+    """[(audio_path, language_hint)] from a plain or JSONL manifest; relative paths are relative to it."""
+    base = os.path.dirname(os.path.abspath(path))
+    items = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("{"):
+                entry = json.loads(line)
+                items.append((os.path.join(base, entry["path"]), entry.get("language")))
+            else:
+                items.append((os.path.join(base, line), None))
+    return items
+
+
+def completed_paths(out_path):
+    """Paths that already have a successful record in the output file."""
+    done = set()
+    if not os.path.exists(out_path):
+        return done
+    with open(out_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # a line cut short by an interrupted run
+            if record.get("status") == "ok":
+                done.add(record["path"])
+    return done
+
+
+def _init_worker(torch_threads):
+    import torch
+    torch.set_num_threads(torch_threads)
+    import transcribe_module  # noqa: F401  (loads the models once per worker)
+
+
+def transcribe_file(path, language_hint=None):
+    """Transcribe one file in a worker; always returns a record, never raises."""
+    import transcribe_module
+
+    record = {"path": path, "status": "ok", "worker": os.getpid()}
+    try:
+        started = time.perf_counter()
+        with open(path, "rb") as f:
+            audio = transcribe_module.decode_audio(f.read())
+        decoded = time.perf_counter()
+        text, language, confidence = transcribe_module.transcribe_waveform(audio, language_hint)
+        finished = time.perf_counter()
+    except Exception as e:
+        record.update(status="error", error=f"{type(e).__name__}: {e}")
+        return record
+
+    duration = len(audio) / transcribe_module.SAMPLE_RATE
+    record.update({
+        "language": language,
+        "language_confidence": round(confidence, 4),
+        "text": text,
+        "duration_s": round(duration, 3),
+        "decode_seconds": round(decoded - started, 3),
+        "asr_seconds": round(finished - decoded, 3),
+        "rtf": round((finished - decoded) / duration, 4) if duration else None,
+    })
+    return record
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transcribe many audio files to JSONL")
+    parser.add_argument("inputs", nargs="*", help="audio files or directories")
+    parser.add_argument("--manifest", help="file listing audio paths (plain or JSONL with path/language)")
+    parser.add_argument("--out", default=DEFAULT_OUT)
+    parser.add_argument("--language", default=None, help="language hint for files without their own (en/ne)")
+    parser.add_argument("--workers", type=int, default=int(os.getenv("ASR_POOL_SIZE", "2")))
+    parser.add_argument("--torch-threads", type=int, default=int(os.getenv("ASR_TORCH_THREADS", "2")))
+    args = parser.parse_args()
+
+    items = read_manifest(args.manifest) if args.manifest else []
+    for entry in args.inputs:
+        paths = find_audio(entry) if os.path.isdir(entry) else [entry]
+        items += [(path, None) for path in paths]
+    if not items:
+        parser.error("no audio files given")
+
+    # Records are keyed by absolute path so resuming works from any directory
+    done = completed_paths(args.out)
+    todo, seen = [], set()
+    for path, hint in items:
+        path = os.path.abspath(path)
+        if path not in done and path not in seen:
+            seen.add(path)
+            todo.append((path, hint or args.language))
+    print(f"{len(todo)} to transcribe, {len(items) - len(todo)} already done or duplicated")
+    if not todo:
+        return
+
+    started = time.perf_counter()
+    failed = audio_seconds = 0
+    with open(args.out, "a", encoding="utf-8") as out, ProcessPoolExecutor(
+            max_workers=max(1, args.workers),
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(args.torch_threads,)) as pool:
+        futures = [pool.submit(transcribe_file, path, hint) for path, hint in todo]
+        try:
+            for n, future in enumerate(as_completed(futures), 1):
+                record = future.result()
+                record["finished_at"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+                if record["status"] == "ok":
+                    audio_seconds += record["duration_s"]
+                else:
+                    failed += 1
+                    print(f"Failed {record['path']}: {record['error']}")
+                if n % 10 == 0 or n == len(futures):
+                    print(f"{n}/{len(futures)} files, {audio_seconds / 60:.1f} min of audio, "
+                          f"{time.perf_counter() - started:.0f}s elapsed")
+        except KeyboardInterrupt:
+            print("Interrupted; finished files are saved and will be skipped next run")
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    print(f"Done: {len(todo) - failed} ok, {failed} failed -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
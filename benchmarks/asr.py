@@ -0,0 +1,167 @@
+# benchmarks/asr.py
+"""
+Speech-to-text benchmark: full precision vs quantized models.
+
+    python -m benchmarks.asr clips/ --modes none,int8 --out asr_bench.json
+
+The clips folder holds audio files (wav, webm, ogg, mp3, m4a, flac), each
+with a reference transcript next to it (clip.wav -> clip.txt). Every mode
+runs in its own fresh process with ASR_QUANTIZE set, so model load time and
+peak memory are measured per mode. Reported per mode:
+
+  wer            - corpus word error rate (word edits / reference words)
+  rtf            - real-time factor (processing seconds / audio seconds)
+  latency        - per-clip seconds, percentiles
+  load_seconds   - model load time
+  peak_rss_mb    - peak resident memory of the worker process
+
+Decoding the audio is excluded from the timings; it is the same in every mode.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+
+from batch_transcribe import AUDIO_EXTENSIONS
+from benchmarks.retrieval import percentiles
+
+
+def normalize_words(text):
+    """Lowercase, drop punctuation (including the danda), split on whitespace."""
+    text = "".join(ch for ch in str(text).lower() if not unicodedata.category(ch).startswith("P"))
+    return text.split()
+
+
+def word_edits(reference, hypothesis):
+    """Levenshtein distance between two word lists."""
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_word in enumerate(reference, 1):
+        current = [i] + [0] * len(hypothesis)
+        for j, hyp_word in enumerate(hypothesis, 1):
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (ref_word != hyp_word))
+        previous = current
+    return previous[-1]
+
+
+def find_clips(folder):
+    """[(audio_path, reference_text)] for every audio file with a .txt next to it."""
+    clips = []
+    for name in sorted(os.listdir(folder)):
+        stem, ext = os.path.splitext(name)
+        if ext.lower() not in AUDIO_EXTENSIONS:
+            continue
+        reference_path = os.path.join(folder, stem + ".txt")
+        if not os.path.exists(reference_path):
+            print(f"Skipping {name}: no {stem}.txt reference")
+            continue
+        with open(reference_path, encoding="utf-8") as f:
+            clips.append((os.path.join(folder, name), f.read().strip()))
+    return clips
+
+
+def _benchmark_mode(mode, clips, language, torch_threads, preload_nepali):
+    """Runs in a fresh process: load models in the given mode and transcribe every clip."""
+    os.environ["ASR_QUANTIZE"] = mode
+    import resource
+    import torch
+    torch.set_num_threads(torch_threads)
+
+    started = time.perf_counter()
+    import transcribe_module
+    if preload_nepali:
+        transcribe_module._ensure_nepali_model_loaded()
+    load_seconds = time.perf_counter() - started
+
+    results = []
+    for path, reference in clips:
+        with open(path, "rb") as f:
+            audio = transcribe_module.decode_audio(f.read())
+        duration = len(audio) / transcribe_module.SAMPLE_RATE
+        began = time.perf_counter()
+        text, detected, confidence = transcribe_module.transcribe_waveform(audio, language)
+        seconds = time.perf_counter() - began
+        ref_words, hyp_words = normalize_words(reference), normalize_words(text)
+        results.append({
+            "clip": os.path.basename(path),
+            "duration_s": round(duration, 3),
+            "seconds": round(seconds, 4),
+            "rtf": round(seconds / duration, 4) if duration else None,
+            "language": detected,
+            "language_confidence": round(confidence, 4),
+            "reference_words": len(ref_words),
+            "edits": word_edits(ref_words, hyp_words),
+            "hypothesis": text,
+        })
+    # ru_maxrss is in KiB on Linux
+    peak_rss_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return {"load_seconds": round(load_seconds, 3), "peak_rss_mb": round(peak_rss_mb, 1), "clips": results}
+
+
+def summarize(mode, run):
+    clips = run["clips"]
+    reference_words = sum(c["reference_words"] for c in clips)
+    audio_seconds = sum(c["duration_s"] for c in clips)
+    busy_seconds = sum(c["seconds"] for c in clips)
+    return {
+        "mode": mode,
+        "clips": len(clips),
+        "audio_seconds": round(audio_seconds, 2),
+        "wer": round(sum(c["edits"] for c in clips) / reference_words, 4) if reference_words else None,
+        "rtf": round(busy_seconds / audio_seconds, 4) if audio_seconds else None,
+        "latency_s": percentiles([c["seconds"] for c in clips]),
+        "load_seconds": run["load_seconds"],
+        "peak_rss_mb": run["peak_rss_mb"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare ASR accuracy and speed across model precisions")
+    parser.add_argument("folder", help="folder of audio clips with .txt references")
+    parser.add_argument("--modes", default="none,int8", help="comma-separated ASR_QUANTIZE values")
+    parser.add_argument("--language", default=None, help="language hint passed to every clip (en/ne)")
+    parser.add_argument("--torch-threads", type=int, default=int(os.getenv("ASR_TORCH_THREADS", "2")))
+    parser.add_argument("--no-preload-nepali", action="store_true",
+                        help="do not count the Nepali model in load time/memory (English-only clips)")
+    parser.add_argument("--out", default="asr_bench.json")
+    args = parser.parse_args()
+
+    clips = find_clips(args.folder)
+    if not clips:
+        parser.error(f"no clips with references in {args.folder}")
+
+    report = {
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "folder": args.folder,
+        "language": args.language,
+        "torch_threads": args.torch_threads,
+        "modes": [],
+        "clips": {},
+    }
+    for mode in [m.strip() for m in args.modes.split(",") if m.strip()]:
+        # One process per mode so each starts from a clean memory baseline
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+            run = pool.submit(_benchmark_mode, mode, clips, args.language, args.torch_threads,
+                              not args.no_preload_nepali).result()
+        summary = summarize(mode, run)
+        report["modes"].append(summary)
+        report["clips"][mode] = run["clips"]
+        print(f"{mode:<6} wer={summary['wer']} rtf={summary['rtf']} p50={summary['latency_s']['p50']}s "
+              f"p95={summary['latency_s']['p95']}s load={summary['load_seconds']}s rss={summary['peak_rss_mb']}MB")
+
+    baseline = report["modes"][0]
+    for summary in report["modes"][1:]:
+        if baseline["rtf"] and summary["rtf"]:
+            summary["speedup_vs_" + baseline["mode"]] = round(baseline["rtf"] / summary["rtf"], 3)
+        if baseline["wer"] is not None and summary["wer"] is not None:
+            summary["wer_delta_vs_" + baseline["mode"]] = round(summary["wer"] - baseline["wer"], 4)
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# benchmarks/intents.py
+"""
+Check the curated-answer matcher against known queries.
+
+    python -m benchmarks.intents
+    python -m benchmarks.intents --intents chatbot_data.json --repeat 1000
+
+Each case is a query, the reply language and the curated phrase it must
+match, or None when it must fall through to retrieval. The None cases are
+near-misses that once got a wrong canned answer ("family planning for
+women" answered as "family planning for men"). Prints every failure and
+the lookup latency, and exits with status 1 if any case fails.
+"""
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from benchmarks.retrieval import percentiles
+from intent_matcher import INTENTS_PATH, IntentMatcher
+
+CASES = [
+    ("what is family planning", "english", "what is family planning"),
+    ("Please tell me what is family planning?", "english", "what is family planning"),
+    ("wht is famly planing", "english", "what is family planning"),
+    ("benifits of family planing", "english", "benefits of family planning"),
+    ("family planing for men", "english", "family planning for men"),
+    ("helo", "english", "hello"),
+    ("family planning surakshit cha", "english", "family planning surakshit cha"),
+    # Different question, or the opposite one: must go to retrieval
+    ("family planning for women", "english", None),
+    ("is family planning unsafe", "english", None),
+    ("is family planning not safe", "english", None),
+    ("what is family planning for", "english", None),
+    ("what is family planning in islam", "english", None),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check curated intent matches")
+    parser.add_argument("--intents", default=INTENTS_PATH)
+    parser.add_argument("--repeat", type=int, default=200, help="timed passes over the cases")
+    args = parser.parse_args()
+
+    matcher = IntentMatcher.load(args.intents)
+    failures = 0
+    for query, language, expected in CASES:
+        result = matcher.match(query, language)
+        got = result["intent"] if result else None
+        if got != expected:
+            failures += 1
+            print(f"FAIL {query!r}: expected {expected!r}, got {got!r} ({result and result['match']})")
+
+    latencies = []
+    for _ in range(args.repeat):
+        for query, language, _ in CASES:
+            started = time.perf_counter()
+            matcher.match(query, language)
+            latencies.append((time.perf_counter() - started) * 1e6)
+    print(f"{len(CASES) - failures}/{len(CASES)} cases pass; lookup us {percentiles(np.array(latencies))}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,282 @@
+# benchmarks/load_test.py
+"""
+End-to-end load test of the Flask app against a stub Ollama server.
+
+    python -m benchmarks.load_test --concurrency 1,4,16 --duration 30 --clips clips/
+    python -m benchmarks.load_test --url http://localhost:5000 --endpoints ask
+
+Without --url the app is started as a subprocess whose OLLAMA_URL points at
+benchmarks.ollama_stub running in this process (token rate, first-token
+delay etc. are set with the stub's own flags), and its reply cache is
+written to a temporary file. With --url a running app is driven as is,
+together with whatever LLM it talks to.
+
+Each endpoint is driven at each concurrency level for --duration seconds
+(or --requests requests) by that many client threads sending requests
+back to back:
+
+  get_response  JSON chat messages; --stream reads the SSE reply and also
+                reports time to first token
+  ask           form-encoded retrieval questions
+  voice_query   multipart uploads of the clips in --clips
+
+Text questions are rows of data/qa.csv, half reworded with the retrieval
+benchmark's paraphraser so that not every message is a reply-cache hit.
+Reported per endpoint and level: requests, errors, throughput, latency
+percentiles, and where the chat replies came from (from /metrics). The
+app's /stats is saved at the end.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import requests
+
+from batch_transcribe import AUDIO_EXTENSIONS
+from benchmarks import ollama_stub
+from benchmarks.retrieval import paraphrase, percentiles
+
+ENDPOINTS = ("get_response", "ask", "voice_query")
+_REPLIES_LINE = re.compile(r'^familycare_replies_total\{source="([^"]+)"\} (\S+)$', re.MULTILINE)
+
+
+def load_questions(count, seed):
+    """count questions from data/qa.csv, every other one paraphrased."""
+    from rag import load_rows
+
+    rng = random.Random(seed)
+    questions = load_rows()["Questions"].tolist()
+    picked = rng.sample(questions, min(count, len(questions)))
+    return [paraphrase(q, rng) if i % 2 else q for i, q in enumerate(picked)]
+
+
+def load_clips(folder):
+    """(filename, bytes) for every audio file in folder."""
+    paths = sorted(p for p in Path(folder).iterdir() if p.suffix.lower() in AUDIO_EXTENSIONS)
+    return [(p.name, p.read_bytes()) for p in paths]
+
+
+class AppProcess:
+    """The Flask app in a subprocess, pointed at the stub Ollama."""
+
+    def __init__(self, port, ollama_url, ready_requires, extra_env=None):
+        self.url = f"http://127.0.0.1:{port}"
+        self.cache_dir = tempfile.TemporaryDirectory(prefix="loadtest-")
+        env = dict(os.environ)
+        env.update({
+            "OLLAMA_URL": ollama_url,
+            "SEMANTIC_CACHE_PATH": os.path.join(self.cache_dir.name, "reply_cache.pkl"),
+            "FAMILYCARE_READY_REQUIRES": ready_requires,
+            "LOG_LEVEL": env.get("LOG_LEVEL", "WARNING"),
+        })
+        env.update(extra_env or {})
+        command = [sys.executable, "-m", "flask", "--app", "app", "run",
+                   "--no-reload", "--with-threads", "--port", str(port)]
+        self.process = subprocess.Popen(command, env=env)
+
+    def wait_ready(self, timeout):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"App exited with code {self.process.returncode} before becoming ready")
+            try:
+                if requests.get(f"{self.url}/readyz", timeout=2).status_code == 200:
+                    return
+            except requests.ConnectionError:
+                pass
+            time.sleep(0.5)
+        raise RuntimeError(f"App not ready after {timeout:.0f}s")
+
+    def stop(self):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self.cache_dir.cleanup()
+
+
+def make_request(endpoint, base_url, payload, stream):
+    """Send one request; returns (ok, status, first_token_seconds or None)."""
+    started = time.perf_counter()
+    if endpoint == "get_response":
+        response = requests.post(f"{base_url}/get_response", json={"message": payload, "stream": stream},
+                                 stream=stream, timeout=300)
+        first_token = None
+        if stream and response.ok:
+            for line in response.iter_lines():
+                if first_token is None and line.startswith(b"data:"):
+                    first_token = time.perf_counter() - started
+        else:
+            response.content
+        return response.ok, response.status_code, first_token
+    if endpoint == "ask":
+        response = requests.post(f"{base_url}/ask", data={"question": payload}, timeout=300)
+    else:
+        name, audio = payload
+        response = requests.post(f"{base_url}/voice_query", files={"audio": (name, audio)}, timeout=600)
+    return response.ok, response.status_code, None
+
+
+def run_level(endpoint, base_url, payloads, concurrency, duration, max_requests, stream):
+    """Drive one endpoint with concurrency back-to-back clients; returns the result record."""
+    records = []
+    lock = threading.Lock()
+    issued = [0]
+    deadline = time.monotonic() + duration if duration else None
+
+    def client():
+        while True:
+            with lock:
+                if (max_requests and issued[0] >= max_requests) or (deadline and time.monotonic() >= deadline):
+                    return
+                payload = payloads[issued[0] % len(payloads)]
+                issued[0] += 1
+            started = time.perf_counter()
+            try:
+                ok, status, first_token = make_request(endpoint, base_url, payload, stream)
+            except requests.RequestException as error:
+                ok, status, first_token = False, type(error).__name__, None
+            elapsed = time.perf_counter() - started
+            with lock:
+                records.append((ok, status, elapsed, first_token))
+
+    began = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(client)
+    wall = time.perf_counter() - began
+    return summarize(endpoint, concurrency, records, wall)
+
+
+def summarize(endpoint, concurrency, records, wall):
+    latencies = np.array([elapsed * 1000 for ok, _, elapsed, _ in records if ok])
+    first_tokens = [ft * 1000 for ok, _, _, ft in records if ok and ft is not None]
+    errors = {}
+    for ok, status, _, _ in records:
+        if not ok:
+            errors[str(status)] = errors.get(str(status), 0) + 1
+    n = len(records)
+    n_errors = sum(errors.values())
+    result = {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": n,
+        "errors": n_errors,
+        "error_rate": round(n_errors / n, 4) if n else None,
+        "errors_by_status": errors,
+        "throughput_rps": round((n - n_errors) / wall, 2) if wall else None,
+        "wall_seconds": round(wall, 2),
+        "latency_ms": {
+            **percentiles(latencies),
+            "mean": round(float(latencies.mean()), 2) if len(latencies) else None,
+        },
+    }
+    if first_tokens:
+        result["first_token_ms"] = percentiles(first_tokens)
+    return result
+
+
+def reply_sources(base_url):
+    """Chat reply counts by source from /metrics, or {} if unavailable."""
+    try:
+        text = requests.get(f"{base_url}/metrics", timeout=10).text
+    except requests.RequestException:
+        return {}
+    return {source: float(value) for source, value in _REPLIES_LINE.findall(text)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test the chat, retrieval and voice endpoints")
+    parser.add_argument("--url", default=None, help="drive a running app instead of starting one with the stub")
+    parser.add_argument("--port", type=int, default=5055, help="port for the app started by this script")
+    parser.add_argument("--endpoints", default="get_response,ask,voice_query")
+    parser.add_argument("--concurrency", default="1,4,16", help="comma-separated client counts")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds per endpoint and level")
+    parser.add_argument("--requests", type=int, default=0, help="requests per endpoint and level (overrides --duration)")
+    parser.add_argument("--warmup", type=int, default=3, help="unmeasured requests per endpoint first")
+    parser.add_argument("--questions", type=int, default=200, help="distinct text questions to cycle through")
+    parser.add_argument("--clips", default=None, help="folder of audio clips for /voice_query")
+    parser.add_argument("--stream", action="store_true", help="request /get_response as SSE")
+    parser.add_argument("--ready-timeout", type=float, default=600.0)
+    parser.add_argument("--seed", type=int, default=13)
+    parser.add_argument("--out", default="load_test.json")
+    ollama_stub.add_arguments(parser)
+    args = parser.parse_args()
+
+    endpoints = [e.strip() for e in args.endpoints.split(",") if e.strip()]
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"unknown endpoints: {', '.join(sorted(unknown))}")
+    clips = load_clips(args.clips) if args.clips else []
+    if "voice_query" in endpoints and not clips:
+        print("No --clips given (or no audio in it); skipping voice_query")
+        endpoints.remove("voice_query")
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    payloads = {"get_response": None, "ask": None, "voice_query": clips}
+    if {"get_response", "ask"} & set(endpoints):
+        questions = load_questions(args.questions, args.seed)
+        payloads["get_response"] = payloads["ask"] = questions
+
+    stub = app = None
+    config = {"endpoints": endpoints, "levels": levels, "duration": args.duration,
+              "requests": args.requests, "stream": args.stream}
+    if args.url:
+        base_url = args.url.rstrip("/")
+    else:
+        stub_config = ollama_stub.config_from_args(args)
+        stub, ollama_url = ollama_stub.start_in_background(stub_config)
+        config["ollama_stub"] = stub_config.as_dict()
+        ready = "rag,asr" if "voice_query" in endpoints else "rag"
+        app = AppProcess(args.port, ollama_url, ready)
+        base_url = app.url
+
+    results = []
+    try:
+        if app:
+            print(f"Starting app on {base_url} (LLM stub at {ollama_url})...")
+            app.wait_ready(args.ready_timeout)
+        for endpoint in endpoints:
+            for payload in payloads[endpoint][:args.warmup]:
+                make_request(endpoint, base_url, payload, args.stream)
+            for concurrency in levels:
+                before = reply_sources(base_url)
+                result = run_level(endpoint, base_url, payloads[endpoint], concurrency,
+                                   0 if args.requests else args.duration, args.requests, args.stream)
+                if endpoint != "ask":
+                    after = reply_sources(base_url)
+                    result["reply_sources"] = {source: int(count - before.get(source, 0))
+                                               for source, count in after.items()
+                                               if count > before.get(source, 0)}
+                results.append(result)
+                latency = result["latency_ms"]
+                print(f"{endpoint:<13} c={concurrency:<3} n={result['requests']:<5} "
+                      f"err={result['error_rate'] or 0:.3f} rps={result['throughput_rps'] or 0:<7} "
+                      f"p50={latency['p50']} p95={latency['p95']} p99={latency['p99']} ms")
+        try:
+            app_stats = requests.get(f"{base_url}/stats", timeout=10).json()
+        except (requests.RequestException, ValueError):
+            app_stats = None
+    finally:
+        if app:
+            app.stop()
+        if stub:
+            stub.shutdown()
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump({"config": config, "results": results, "app_stats": app_stats}, f, indent=2)
+    print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
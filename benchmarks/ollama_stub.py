@@ -0,0 +1,208 @@
+# benchmarks/ollama_stub.py
+"""
+Stand-in for Ollama's /api/generate, for load tests without a real model.
+
+    python -m benchmarks.ollama_stub --port 11435 --tokens-per-s 25 --first-token-ms 300
+    OLLAMA_URL=http://127.0.0.1:11435 python app.py
+
+Replies stream as NDJSON like Ollama's: one chunk per token at the given
+rate after a time-to-first-token delay, then a final done chunk with
+prompt_eval_count, eval_count, durations (ns) and a context array. The
+delay grows with the prompt (--prefill-ms-per-token), so prompt bloat shows
+up in latency as it would against a real model. --max-concurrent mimics
+OLLAMA_NUM_PARALLEL: extra requests wait for a free slot.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = ("family planning helps couples decide when to have children and how many "
+         "methods include condoms pills injections implants and intrauterine devices").split()
+
+
+def _estimate_tokens(text):
+    return max(1, len(text) // 4)
+
+
+class StubConfig:
+    def __init__(self, tokens_per_s=25.0, first_token_ms=300.0, prefill_ms_per_token=0.5,
+                 reply_tokens=60, jitter=0.1, max_concurrent=0, error_rate=0.0, seed=None):
+        self.tokens_per_s = tokens_per_s
+        self.first_token_ms = first_token_ms
+        self.prefill_ms_per_token = prefill_ms_per_token
+        self.reply_tokens = reply_tokens
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.slots = threading.BoundedSemaphore(max_concurrent) if max_concurrent > 0 else None
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    def vary(self, value):
+        return value * (1 + self.rng.uniform(-self.jitter, self.jitter)) if self.jitter else value
+
+    def as_dict(self):
+        return {
+            "tokens_per_s": self.tokens_per_s,
+            "first_token_ms": self.first_token_ms,
+            "prefill_ms_per_token": self.prefill_ms_per_token,
+            "reply_tokens": self.reply_tokens,
+            "jitter": self.jitter,
+            "error_rate": self.error_rate,
+        }
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    config: StubConfig = None  # set on the subclass by make_server
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == "/api/version":
+            self._send_json(200, {"version": "stub"})
+        elif self.path == "/api/tags":
+            self._send_json(200, {"models": [{"name": "mistral:latest"}]})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        if self.path != "/api/generate":
+            self._send_json(404, {"error": "not found"})
+            return
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        config = self.config
+        with config.lock:
+            config.requests += 1
+            fail = config.rng.random() < config.error_rate
+        if fail:
+            self._send_json(500, {"error": "stub failure"})
+            return
+
+        if config.slots:
+            config.slots.acquire()
+        try:
+            self._generate(request, config)
+        finally:
+            if config.slots:
+                config.slots.release()
+
+    def _generate(self, request, config):
+        started = time.perf_counter()
+        prompt_tokens = _estimate_tokens(request.get("prompt", "")) + _estimate_tokens(request.get("system", ""))
+        prefill = (config.vary(config.first_token_ms) + prompt_tokens * config.prefill_ms_per_token) / 1000
+        n_tokens = max(1, int(config.vary(config.reply_tokens)))
+        tokens = [config.rng.choice(WORDS) + " " for _ in range(n_tokens)]
+
+        time.sleep(prefill)
+        prefill_done = time.perf_counter()
+        if not request.get("stream", True):
+            time.sleep(n_tokens / config.tokens_per_s)
+            final = self._final(request, prompt_tokens, n_tokens, started, prefill_done)
+            self._send_json(200, dict(final, response="".join(tokens)))
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        interval = 1.0 / config.tokens_per_s
+        for i, token in enumerate(tokens):
+            if i:
+                time.sleep(interval)
+            self._chunk({"model": request.get("model"), "response": token, "done": False})
+        self._chunk(self._final(request, prompt_tokens, n_tokens, started, prefill_done))
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _chunk(self, payload):
+        line = (json.dumps(payload) + "\n").encode()
+        self.wfile.write(f"{len(line):x}\r\n".encode() + line + b"\r\n")
+        self.wfile.flush()
+
+    @staticmethod
+    def _final(request, prompt_tokens, n_tokens, started, prefill_done):
+        now = time.perf_counter()
+        previous = request.get("context") or []
+        return {
+            "model": request.get("model"),
+            "response": "",
+            "done": True,
+            "done_reason": "stop",
+            "total_duration": int((now - started) * 1e9),
+            "load_duration": 0,
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int((prefill_done - started) * 1e9),
+            "eval_count": n_tokens,
+            "eval_duration": int((now - prefill_done) * 1e9),
+            # Like Ollama's: the conversation so far as token ids
+            "context": list(previous) + list(range(prompt_tokens + n_tokens)),
+        }
+
+
+def make_server(config, host="127.0.0.1", port=0):
+    """A ThreadingHTTPServer serving the stub; port 0 picks a free port."""
+    handler = type("ConfiguredStubHandler", (StubHandler,), {"config": config})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_in_background(config, host="127.0.0.1", port=0):
+    """Start the stub on a daemon thread; returns (server, base_url)."""
+    server = make_server(config, host, port)
+    threading.Thread(target=server.serve_forever, name="ollama-stub", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+def add_arguments(parser):
+    parser.add_argument("--tokens-per-s", type=float, default=25.0, help="generation speed")
+    parser.add_argument("--first-token-ms", type=float, default=300.0, help="base time to first token")
+    parser.add_argument("--prefill-ms-per-token", type=float, default=0.5,
+                        help="extra time to first token per prompt token")
+    parser.add_argument("--reply-tokens", type=int, default=60, help="tokens per reply")
+    parser.add_argument("--jitter", type=float, default=0.1, help="relative random variation of the above")
+    parser.add_argument("--max-concurrent", type=int, default=0, help="generation slots (0 = unlimited)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 500")
+
+
+def config_from_args(args):
+    return StubConfig(
+        tokens_per_s=args.tokens_per_s,
+        first_token_ms=args.first_token_ms,
+        prefill_ms_per_token=args.prefill_ms_per_token,
+        reply_tokens=args.reply_tokens,
+        jitter=args.jitter,
+        max_concurrent=args.max_concurrent,
+        error_rate=args.error_rate,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stub of Ollama's streaming /api/generate")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11435)
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    server = make_server(config_from_args(args), args.host, args.port)
+    print(f"Ollama stub on http://{args.host}:{server.server_address[1]} ({server.RequestHandlerClass.config.as_dict()})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+# benchmarks/retrieval.py
+"""
+Retrieval benchmark over data/qa.csv.
+
+    python -m benchmarks.retrieval --sample 500 --out retrieval_bench.json
+    python -m benchmarks.retrieval --url http://localhost:5000   # via /ask_batch
+
+Three query sets are generated from the sheet:
+
+  exact      - the stored question verbatim
+  paraphrase - rule-based rewordings (reworded openers, dropped words, typos)
+  held_out   - questions whose rows are removed from a temporary index, so
+               the score distribution shows how often an uncovered question
+               still clears the cutoff
+
+Exact and paraphrase queries go through rag_qa in bulk (or /ask_batch with
+--url) and report recall@1/@5, scores against the cutoff, latency
+percentiles and throughput. Results are written as JSON so runs can be diffed.
+"""
+import argparse
+import json
+import os
+import random
+import re
+import string
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from rag import (INDEX_CONFIG_PATH, VECTORS_PATH, VECTOR_IDS_PATH, build_index, load_rows)
+
+OPENER_REWRITES = [
+    (r"^what is\b", ["can you explain", "tell me about", "define"]),
+    (r"^what are\b", ["tell me about", "list", "explain"]),
+    (r"^how do i\b", ["what is the way to", "how can i", "how should i"]),
+    (r"^how does\b", ["in what way does", "explain how"]),
+    (r"^can i\b", ["is it possible to", "is it ok if i", "am i able to"]),
+    (r"^is it\b", ["would it be", "is that"]),
+    (r"^why\b", ["what is the reason", "how come"]),
+]
+FILLER_WORDS = {"the", "a", "an", "is", "are", "of", "to", "my", "your", "really", "please"}
+
+
+def _normalize(text):
+    return " ".join(str(text).lower().split())
+
+
+def paraphrase(question, rng):
+    """Produce a cheap, deterministic rewording of a question."""
+    text = question.lower().strip().rstrip("?").strip()
+    for pattern, replacements in OPENER_REWRITES:
+        if re.search(pattern, text):
+            text = re.sub(pattern, rng.choice(replacements), text, count=1)
+            break
+
+    words = text.split()
+    droppable = [i for i, w in enumerate(words) if w.strip(string.punctuation) in FILLER_WORDS]
+    if droppable and len(words) > 4:
+        del words[rng.choice(droppable)]
+
+    long_words = [i for i, w in enumerate(words) if len(w) > 5 and w.isalpha()]
+    if long_words and rng.random() < 0.5:
+        i = rng.choice(long_words)
+        j = rng.randrange(1, len(words[i]) - 2)
+        w = words[i]
+        words[i] = w[:j] + w[j + 1] + w[j] + w[j + 2:]
+    return " ".join(words) + ("?" if rng.random() < 0.5 else "")
+
+
+def percentiles(values, points=(50, 95, 99)):
+    if not len(values):
+        return {f"p{p}": None for p in points}
+    return {f"p{p}": round(float(np.percentile(values, p)), 4) for p in points}
+
+
+def score_summary(scores, cutoff):
+    scores = np.asarray(scores, dtype=float)
+    hist, edges = np.histogram(scores, bins=10, range=(0.0, 1.0))
+    return {
+        "mean": round(float(scores.mean()), 4) if len(scores) else None,
+        **percentiles(scores, (5, 25, 50, 75, 95)),
+        "above_cutoff": round(float((scores >= cutoff).mean()), 4) if len(scores) else None,
+        "histogram": {f"{edges[i]:.1f}-{edges[i + 1]:.1f}": int(hist[i]) for i in range(len(hist))},
+    }
+
+
+def run_local(queries, k, concurrency):
+    """Run queries through rag_qa.rag_search from a thread pool; returns (hits, latency_ms) per query."""
+    from rag_qa import rag_search
+
+    def one(query):
+        start = time.perf_counter()
+        hits = rag_search(query, k=k)
+        return hits, (time.perf_counter() - start) * 1000
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(one, queries))
+
+
+def run_http(queries, k, url, batch_size):
+    """Send queries to /ask_batch in chunks; per-query latency is the chunk latency."""
+    import requests
+
+    session = requests.Session()
+    results = []
+    for start in range(0, len(queries), batch_size):
+        chunk = queries[start:start + batch_size]
+        began = time.perf_counter()
+        response = session.post(f"{url.rstrip('/')}/ask_batch", json={"questions": chunk, "k": k}, timeout=120)
+        response.raise_for_status()
+        elapsed = (time.perf_counter() - began) * 1000
+        results += [(item["hits"], elapsed) for item in response.json()["results"]]
+    return results
+
+
+def evaluate(name, queries, targets, outcomes, wall_seconds, cutoff):
+    recall_1 = recall_5 = 0
+    for target, (hits, _) in zip(targets, outcomes):
+        found = [_normalize(h["question"]) for h in hits]
+        recall_1 += bool(found[:1]) and found[0] == target
+        recall_5 += target in found[:5]
+    latencies = [ms for _, ms in outcomes]
+    top_scores = [hits[0]["score"] if hits else 0.0 for hits, _ in outcomes]
+    n = len(queries)
+    return {
+        "set": name,
+        "queries": n,
+        "recall_at_1": round(recall_1 / n, 4),
+        "recall_at_5": round(recall_5 / n, 4),
+        "score": score_summary(top_scores, cutoff),
+        "latency_ms": percentiles(latencies),
+        "qps": round(n / wall_seconds, 2) if wall_seconds else None,
+    }
+
+
+def held_out_scores(rows, fraction, rng_seed, cutoff):
+    """
+    Score held-out questions against an index of the remaining rows, using
+    the vectors rag.py stored. High scores here are near-duplicate questions
+    that would be (rightly or wrongly) answered from another row.
+    """
+    if not (os.path.exists(VECTORS_PATH) and os.path.exists(VECTOR_IDS_PATH)):
+        return None
+    vectors = np.load(VECTORS_PATH)
+    ids = np.load(VECTOR_IDS_PATH)
+    known = np.isin(ids, rows["id"].to_numpy())
+    vectors, ids = vectors[known], ids[known]
+
+    rng = np.random.default_rng(rng_seed)
+    held = rng.random(len(ids)) < fraction
+    index = build_index(vectors[~held], "flat")
+    scores, _ = index.search(vectors[held], 1)
+    top = np.clip(scores[:, 0], 0.0, 1.0)
+    return {"set": "held_out", "queries": int(held.sum()), "score": score_summary(top, cutoff)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark retrieval quality and speed over data/qa.csv")
+    parser.add_argument("--sample", type=int, default=500, help="rows to sample for exact/paraphrase queries")
+    parser.add_argument("--seed", type=int, default=13)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--concurrency", type=int, default=8, help="client threads in local mode")
+    parser.add_argument("--url", default=None, help="benchmark a running app through /ask_batch instead")
+    parser.add_argument("--batch-size", type=int, default=32, help="questions per /ask_batch call")
+    parser.add_argument("--held-out", type=float, default=0.1, help="fraction of rows for the held-out set")
+    parser.add_argument("--cutoff", type=float, default=float(os.getenv("RAG_SCORE_CUTOFF", "0.40")))
+    parser.add_argument("--out", default="retrieval_bench.json")
+    args = parser.parse_args()
+
+    rows = load_rows()
+    rng = random.Random(args.seed)
+    sample = rows.sample(n=min(args.sample, len(rows)), random_state=args.seed)
+    targets = [_normalize(q) for q in sample["Questions"]]
+    query_sets = {
+        "exact": sample["Questions"].tolist(),
+        "paraphrase": [paraphrase(q, rng) for q in sample["Questions"]],
+    }
+
+    report = {
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "mode": "http" if args.url else "local",
+        "cutoff": args.cutoff,
+        "k": args.k,
+        "sample": len(sample),
+        "seed": args.seed,
+        "index": json.load(open(INDEX_CONFIG_PATH, encoding="utf-8")) if os.path.exists(INDEX_CONFIG_PATH) else None,
+        "sets": [],
+    }
+
+    for name, queries in query_sets.items():
+        started = time.perf_counter()
+        if args.url:
+            outcomes = run_http(queries, args.k, args.url, args.batch_size)
+        else:
+            outcomes = run_local(queries, args.k, args.concurrency)
+        wall = time.perf_counter() - started
+        result = evaluate(name, queries, targets, outcomes, wall, args.cutoff)
+        report["sets"].append(result)
+        print(f"{name:<11} recall@1={result['recall_at_1']:.3f} recall@5={result['recall_at_5']:.3f} "
+              f"above_cutoff={result['score']['above_cutoff']:.3f} p50={result['latency_ms']['p50']}ms "
+              f"p95={result['latency_ms']['p95']}ms p99={result['latency_ms']['p99']}ms qps={result['qps']}")
+
+    held = held_out_scores(rows, args.held_out, args.seed, args.cutoff)
+    if held:
+        report["sets"].append(held)
+        print(f"{'held_out':<11} queries={held['queries']} above_cutoff={held['score']['above_cutoff']:.3f}")
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
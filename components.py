@@ -0,0 +1,100 @@
+# components.py
+"""
+Lazily loaded heavy components (RAG stack, speech stack) and an import-time
+profile, so the web app can start serving before models are in memory.
+"""
+import importlib
+import logging
+import sys
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+# module name -> seconds spent importing it (including anything it pulled in)
+IMPORT_PROFILE = {}
+
+
+def timed_import(module_name):
+    """Import a module and record how long it took if it was not loaded yet."""
+    first_import = module_name not in sys.modules
+    started = time.perf_counter()
+    module = importlib.import_module(module_name)
+    if first_import:
+        IMPORT_PROFILE.setdefault(module_name, round(time.perf_counter() - started, 4))
+    return module
+
+
+def import_profile():
+    """Recorded import costs, most expensive first."""
+    return dict(sorted(IMPORT_PROFILE.items(), key=lambda item: item[1], reverse=True))
+
+
+class LazyComponent:
+    """
+    A value built on first use by loader(), at most once, thread-safely.
+
+    Concurrent callers wait for the same load. A failed load is remembered
+    and retried on the next get().
+    """
+
+    def __init__(self, name, loader):
+        self.name = name
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._value = None
+        self.state = "pending"  # pending | loading | ready | failed
+        self.error = None
+        self.load_seconds = None
+
+    @property
+    def ready(self):
+        return self.state == "ready"
+
+    def get(self):
+        if self.state == "ready":
+            return self._value
+        with self._lock:
+            if self.state != "ready":
+                self.state = "loading"
+                started = time.perf_counter()
+                try:
+                    self._value = self._loader()
+                except Exception as e:
+                    self.state = "failed"
+                    self.error = f"{type(e).__name__}: {e}"
+                    raise
+                self.load_seconds = round(time.perf_counter() - started, 3)
+                self.error = None
+                self.state = "ready"
+        return self._value
+
+    def load_in_background(self):
+        """Start loading on a daemon thread; errors surface via status()."""
+        def run():
+            try:
+                self.get()
+            except Exception:
+                log.exception("Background load of %s failed", self.name)
+                return
+            log.info("%s ready in %.2fs; import profile: %s", self.name, self.load_seconds, import_profile())
+
+        threading.Thread(target=run, name=f"load-{self.name}", daemon=True).start()
+
+    def status(self):
+        return {"state": self.state, "load_seconds": self.load_seconds, "error": self.error}
+
+
+COMPONENTS = {}
+
+
+def register(name, loader):
+    component = COMPONENTS[name] = LazyComponent(name, loader)
+    return component
+
+
+def readiness(required=()):
+    """Return (is_ready, per-component status) for the named components."""
+    statuses = {name: component.status() for name, component in COMPONENTS.items()}
+    is_ready = all(COMPONENTS[name].ready for name in required if name in COMPONENTS)
+    return is_ready, statuses
@@ -0,0 +1,107 @@
+# context_builder.py
+"""
+Turn retrieval hits into the reference text sent to the model.
+
+Passages are taken best first, near-duplicates of an already chosen one are
+skipped, and packing stops at a token budget so prefill time stays bounded
+however many hits come back.
+"""
+import math
+import os
+import re
+
+from prompts import CONVERSATION_MAX_TOKENS, SYSTEM_PROMPT
+
+# Passages considered per question
+RAG_CONTEXT_K = int(os.getenv("RAG_CONTEXT_K", "5"))
+# Room kept free in the context window for the reply
+CONVERSATION_REPLY_TOKENS = int(os.getenv("CONVERSATION_REPLY_TOKENS", "512"))
+# Budget for earlier turns sent as text once a conversation is compacted
+CONVERSATION_HISTORY_TOKENS = int(os.getenv("CONVERSATION_HISTORY_TOKENS", "600"))
+# The question itself, prompt labels and slack in the estimate
+_QUESTION_TOKENS = 150
+# Share of the shorter passage's words found in a chosen one that makes it a duplicate
+RAG_DEDUP_OVERLAP = float(os.getenv("RAG_DEDUP_OVERLAP", "0.8"))
+
+_WORD = re.compile(r"\w+")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap, deliberately generous token estimate: ~4 characters per token for
+    Latin text, one token per character for Devanagari and other non-ASCII
+    text (which Llama/Mistral-style tokenizers split finely).
+    """
+    ascii_chars = sum(1 for ch in text if ch.isascii())
+    return math.ceil(ascii_chars / 4 + (len(text) - ascii_chars))
+
+
+# Budget for the reference text: at most 700 tokens to keep prefill short,
+# less when the window (CONVERSATION_MAX_TOKENS) cannot also hold the system
+# prompt, compacted history, question and reply
+RAG_CONTEXT_TOKENS = int(os.getenv("RAG_CONTEXT_TOKENS", str(max(100, min(
+    700, CONVERSATION_MAX_TOKENS - estimate_tokens(SYSTEM_PROMPT) - CONVERSATION_HISTORY_TOKENS
+    - CONVERSATION_REPLY_TOKENS - _QUESTION_TOKENS)))))
+
+
+def _words(text):
+    return set(_WORD.findall(text.lower()))
+
+
+def _is_near_duplicate(words, chosen):
+    for other in chosen:
+        smaller = min(len(words), len(other))
+        if smaller and len(words & other) / smaller >= RAG_DEDUP_OVERLAP:
+            return True
+    return False
+
+
+def _format_passage(number, hit):
+    return f"[{number}] Q: {hit['question'].strip()}\nA: {hit['answer'].strip()}"
+
+
+def truncate_to_budget(text, budget):
+    """Cut text (at a word boundary if possible) so its estimate fits the budget."""
+    while text and estimate_tokens(text) > budget:
+        cut = max(int(len(text) * budget / estimate_tokens(text)), 0)
+        shorter = text[:cut].rsplit(" ", 1)[0] if " " in text[:cut] else text[:cut]
+        text = shorter if len(shorter) < len(text) else text[:-1]
+    return text
+
+
+def assemble_context(hits, cutoff=0.0, max_tokens=RAG_CONTEXT_TOKENS):
+    """
+    Pack hits (best first) into reference text.
+
+    Returns a dict with text, passages (count), tokens (estimated), ids of
+    the rows used and top_score. Hits below cutoff are ignored; the best hit
+    is truncated rather than dropped if it alone exceeds the budget.
+    """
+    chosen_words, parts, ids = [], [], []
+    used = 0
+    for hit in hits:
+        if hit["score"] < cutoff:
+            continue
+        words = _words(hit["answer"])
+        if _is_near_duplicate(words, chosen_words):
+            continue
+        passage = _format_passage(len(parts) + 1, hit)
+        tokens = estimate_tokens(passage) + 1  # + separator
+        if used + tokens > max_tokens:
+            if parts:
+                continue  # a later, shorter passage may still fit
+            passage = truncate_to_budget(passage, max_tokens)
+            tokens = estimate_tokens(passage)
+            if not passage:
+                break
+        parts.append(passage)
+        chosen_words.append(words)
+        ids.append(hit["id"])
+        used += tokens
+    return {
+        "text": "\n\n".join(parts),
+        "passages": len(parts),
+        "tokens": used,
+        "ids": ids,
+        "top_score": hits[0]["score"] if hits else 0.0,
+    }
@@ -0,0 +1,223 @@
+# conversation_memory.py
+"""
+Per-conversation state for follow-up questions ("what about its side effects?").
+
+Each conversation keeps its recent turns as text and the `context` token
+array Ollama returned after the last generated reply. When that context
+still covers every turn and there is room for the next question, it is
+sent back and Ollama carries on from it: earlier turns are not rebuilt
+into the prompt, and the unchanged prefix is not evaluated again.
+
+A turn answered without the LLM (from the reply cache) is not in that
+context; such turns are kept as a short text tail and sent in the prompt
+alongside the context, which the next generated reply then covers again.
+
+Once the next turn would not fit in the token budget (or the tail outgrows
+the history budget), the conversation is compacted: the context is dropped
+and the most recent turns go into the prompt as plain text, within the
+history budget.
+
+Conversations are kept in memory, per process, evicted least recently used
+beyond max_sessions and after ttl seconds idle.
+
+Only questions that read as follow-ups (see depends_on_history) need the
+conversation to be understood; the rest can still be answered from, and
+fill, the semantic reply cache.
+"""
+import os
+import re
+import threading
+import time
+from array import array
+from collections import OrderedDict, deque
+
+from context_builder import (CONVERSATION_HISTORY_TOKENS, CONVERSATION_REPLY_TOKENS, estimate_tokens,
+                             truncate_to_budget)
+from prompts import CONVERSATION_MAX_TOKENS
+
+# Below this much room for reference text, the conversation is compacted
+CONVERSATION_MIN_ROOM = int(os.getenv("CONVERSATION_MIN_ROOM", "200"))
+CONVERSATION_MAX_TURNS = int(os.getenv("CONVERSATION_MAX_TURNS", "20"))
+CONVERSATION_MAX_SESSIONS = int(os.getenv("CONVERSATION_MAX_SESSIONS", "1000"))
+CONVERSATION_TTL = float(os.getenv("CONVERSATION_TTL", str(30 * 60)))
+# Questions this short (in words) are taken as follow-ups ("and for men?")
+FOLLOW_UP_MAX_WORDS = int(os.getenv("FOLLOW_UP_MAX_WORDS", "3"))
+
+# Openers that continue the previous question ("what about ...", "and ...")
+_FOLLOW_UP_OPENERS = ("and ", "also ", "but ", "or ", "so ", "then ", "what about ", "how about ",
+                      "what if ", "which one", "tyo ", "yo ", "ani ", "ra ", "त्यो ", "यो ", "अनि ", "र ")
+# Words pointing back at something said earlier
+_REFERRING_WORDS = frozenset("""
+    it its it's they them their theirs this that these those he she him her
+    yo tyo yesko tesko uniharu
+    यो त्यो यसको त्यसको उनीहरू
+""".split())
+_WORD = re.compile(r"[\w'\u0900-\u097f]+")
+
+
+def depends_on_history(question: str, top_score: float = 1.0, score_cutoff: float = 0.0) -> bool:
+    """
+    Whether a question probably needs the earlier turns to make sense: very
+    short, opening like a continuation, or short with a pronoun ("is it
+    painful?"), or nothing in the knowledge base matches it on its own.
+    """
+    text = " ".join(question.lower().split()) + " "
+    words = _WORD.findall(text)
+    if len(words) <= FOLLOW_UP_MAX_WORDS or text.startswith(_FOLLOW_UP_OPENERS):
+        return True
+    if len(words) <= 8 and _REFERRING_WORDS.intersection(words):
+        return True
+    return top_score < score_cutoff
+
+
+class _Conversation:
+    def __init__(self, max_turns):
+        self.turns = deque(maxlen=max_turns)  # (user message, reply)
+        self.context = None  # array("i") of Ollama context tokens
+        self.uncovered = 0  # latest turns not in the context
+        self.used_at = time.time()
+
+
+class ConversationMemory:
+    def __init__(
+        self,
+        max_tokens: int = CONVERSATION_MAX_TOKENS,
+        reply_tokens: int = CONVERSATION_REPLY_TOKENS,
+        min_room: int = CONVERSATION_MIN_ROOM,
+        history_tokens: int = CONVERSATION_HISTORY_TOKENS,
+        max_turns: int = CONVERSATION_MAX_TURNS,
+        max_sessions: int = CONVERSATION_MAX_SESSIONS,
+        ttl: float = CONVERSATION_TTL,
+    ):
+        self.max_tokens = max_tokens
+        self.reply_tokens = reply_tokens
+        self.min_room = min_room
+        self.history_tokens = history_tokens
+        self.max_turns = max(1, max_turns)
+        self.max_sessions = max(1, max_sessions)
+        self.ttl = ttl
+        self._sessions = OrderedDict()  # conversation id -> _Conversation, least recently used first
+        self._lock = threading.Lock()
+        self.continued = 0
+        self.compacted = 0
+        self.evicted = 0
+
+    def _get(self, conversation_id, now):
+        """Live conversation for an id (refreshed as most recent), or None. Caller holds the lock."""
+        conversation = self._sessions.get(conversation_id)
+        if conversation is None:
+            return None
+        if self.ttl > 0 and now - conversation.used_at > self.ttl:
+            del self._sessions[conversation_id]
+            self.evicted += 1
+            return None
+        self._sessions.move_to_end(conversation_id)
+        conversation.used_at = now
+        return conversation
+
+    def has_history(self, conversation_id) -> bool:
+        if not conversation_id:
+            return False
+        with self._lock:
+            conversation = self._get(conversation_id, time.time())
+            return bool(conversation and conversation.turns)
+
+    def plan(self, conversation_id, question: str, reference_budget: int) -> dict:
+        """
+        How to send the next question of a conversation. Returns a dict with
+        context (token list to send, or None), history (text of earlier
+        turns for the prompt, or "") and reference_tokens (budget left for
+        retrieved reference text).
+        """
+        plan = {"context": None, "history": "", "reference_tokens": reference_budget}
+        if not conversation_id:
+            return plan
+        with self._lock:
+            conversation = self._get(conversation_id, time.time())
+            if conversation is None or not conversation.turns:
+                return plan
+            if conversation.context is not None:
+                tail = list(conversation.turns)[len(conversation.turns) - conversation.uncovered:]
+                tail_text = "\n".join(self._turn_text(turn) for turn in tail)
+                tail_tokens = estimate_tokens(tail_text)
+                room = (self.max_tokens - len(conversation.context) - tail_tokens
+                        - estimate_tokens(question) - self.reply_tokens)
+                if tail_tokens <= self.history_tokens and room >= self.min_room:
+                    self.continued += 1
+                    plan["context"] = conversation.context.tolist()
+                    plan["history"] = tail_text
+                    plan["reference_tokens"] = min(reference_budget, room)
+                    return plan
+            # Compact: start a fresh context from the most recent turns as text
+            self.compacted += 1
+            conversation.context = None
+            plan["history"] = self._recent_turns_text(conversation.turns)
+            return plan
+
+    @staticmethod
+    def _turn_text(turn):
+        user_message, reply = turn
+        return f"User: {user_message.strip()}\nAssistant: {reply.strip()}"
+
+    def _recent_turns_text(self, turns):
+        lines, used = [], 0
+        for turn in reversed(turns):
+            text = self._turn_text(turn)
+            tokens = estimate_tokens(text) + 1
+            if used + tokens > self.history_tokens:
+                if not lines:
+                    lines.append(truncate_to_budget(text, self.history_tokens))
+                break
+            lines.append(text)
+            used += tokens
+        return "\n".join(reversed(lines))
+
+    def record(self, conversation_id, user_message: str, reply: str, context=None):
+        """
+        Add a finished turn. context is Ollama's context after generating
+        this reply; without it (a cached reply) the stored context is kept
+        and the turn joins the text tail sent along with it.
+        """
+        if not conversation_id or not reply:
+            return
+        now = time.time()
+        with self._lock:
+            conversation = self._get(conversation_id, now)
+            if conversation is None:
+                self._evict_idle(now)
+                conversation = self._sessions[conversation_id] = _Conversation(self.max_turns)
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+                    self.evicted += 1
+            conversation.turns.append((user_message, reply))
+            if context:
+                conversation.context = array("i", context)
+                conversation.uncovered = 0
+            else:
+                conversation.uncovered += 1
+                if conversation.uncovered > len(conversation.turns):
+                    # A tail turn fell off the end of turns: the next question compacts
+                    conversation.context = None
+                    conversation.uncovered = len(conversation.turns)
+
+    def _evict_idle(self, now):
+        """Drop idle conversations from the least recently used end. Caller holds the lock."""
+        while self._sessions and self.ttl > 0:
+            oldest = next(iter(self._sessions.values()))
+            if now - oldest.used_at <= self.ttl:
+                break
+            self._sessions.popitem(last=False)
+            self.evicted += 1
+
+    def forget(self, conversation_id):
+        with self._lock:
+            self._sessions.pop(conversation_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "sessions": len(self._sessions),
+                "continued": self.continued,
+                "compacted": self.compacted,
+                "evicted": self.evicted,
+            }
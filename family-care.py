@@ -1,4 +1,4 @@
-import requests
+from llm_client import client, LLMBusyError
 
 # 🔧 Your system prompt
 SYSTEM_PROMPT = """
@@ -20,30 +20,14 @@ def chat_with_mistral(user_input):
     Sends the user's input and system prompt to the local Ollama Mistral model.
     """
 
-    # Combine the system prompt + user message
-    full_prompt = f"{SYSTEM_PROMPT}\n\nUser: {user_input}\nAssistant:"
-
-    # Send request to Ollama
-    response = requests.post(
-        "http://localhost:11434/api/generate",
-        json={
-            "model": "mistral",
-            "prompt": full_prompt,
-            "stream": True  # stream=True makes it show responses as they generate
-        },
-        stream=True
-    )
-
-    # Print the streamed response
+    # The system prompt goes in Ollama's system field, so it is not re-sent
+    # as part of every prompt and its evaluated prefix can be reused
     print("\nFamilyCare:", end=" ", flush=True)
-    for line in response.iter_lines():
-        if line:
-            # Decode line safely
-            data = line.decode("utf-8")
-            # Only print text tokens, ignore other data
-            if '"response"' in data:
-                part = data.split('"response":"')[-1].split('"')[0]
-                print(part, end="", flush=True)
+    try:
+        for fragment in client.stream(f"User: {user_input}", model="mistral", system=SYSTEM_PROMPT):
+            print(fragment, end="", flush=True)
+    except LLMBusyError:
+        print("(busy, please try again)", end="")
     print("\n")
 
 
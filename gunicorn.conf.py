@@ -0,0 +1,41 @@
+# gunicorn.conf.py
+"""
+Production launch, one gunicorn instance per tier (see wsgi.py):
+
+    FAMILYCARE_TIER=text  gunicorn -c gunicorn.conf.py
+    FAMILYCARE_TIER=voice gunicorn -c gunicorn.conf.py
+
+with the reverse proxy sending /voice_query, /voice_jobs and /voice_stream
+to the voice tier and everything else to the text tier.
+"""
+import os
+
+_tier = os.getenv("FAMILYCARE_TIER", "text")
+
+wsgi_app = "wsgi:app"
+# Import the app and load the models in the master, then fork the workers
+preload_app = True
+bind = os.getenv("BIND", "0.0.0.0:8000" if _tier == "text" else "0.0.0.0:8001")
+workers = int(os.getenv("TEXT_WORKERS", "4") if _tier == "text" else os.getenv("VOICE_WORKERS", "2"))
+# Threads per worker: SSE replies and voice requests mostly wait on Ollama or ASR
+worker_class = "gthread"
+threads = int(os.getenv("WORKER_THREADS", "8"))
+timeout = int(os.getenv("WORKER_TIMEOUT", "300"))
+graceful_timeout = 30
+accesslog = os.getenv("ACCESS_LOG") or None
+
+
+def when_ready(server):
+    import wsgi
+    server.log.info("%s tier: %d workers x %d threads; master %s",
+                    _tier, workers, threads, wsgi.memory_summary())
+
+
+def post_fork(server, worker):
+    import wsgi
+    wsgi.init_worker()
+
+
+def post_worker_init(worker):
+    import wsgi
+    worker.log.info("Worker %s up: %s", worker.pid, wsgi.memory_summary())
@@ -0,0 +1,182 @@
+# intent_matcher.py
+"""
+Curated answers from chatbot_data.json, matched without any model.
+
+The phrases are compiled at startup into an exact-match table and a
+word-level trie. A query matches an intent when:
+
+  exact   - its normalized text is a curated phrase
+  phrase  - it contains a curated phrase and its other words are only
+            filler ("please tell me what is family planning?" -> "what is
+            family planning"); "what is family planning in islam" asks
+            something more specific and goes to retrieval instead
+  fuzzy   - it is a phrase with typos ("wht is famly planing"): same word
+            count, each differing word a small edit of the phrase's word and
+            not its negation or opposite ("unsafe", "women" for "men")
+
+Both language tables are searched, the reply language's first, so
+romanized Nepali phrases get their Nepali answer whatever the UI language.
+"""
+import json
+import os
+import threading
+import unicodedata
+from collections import Counter
+
+INTENTS_PATH = os.getenv("INTENTS_PATH", "chatbot_data.json")
+# Words that may surround a curated phrase without changing the question
+_FILLER_WORDS = frozenset("""
+    a an the please kindly me us i you my can could would tell give show explain know want to
+    about on some info details what is are hey hi hello thanks thank
+    malai kripaya ke ho ko bare barema bhannus
+    कृपया मलाई के हो को बारे बारेमा भन्नुहोस्
+""".split())
+# Typos allowed per word of five or more letters; shorter words allow one,
+# and words of one or two letters must match exactly
+INTENT_FUZZY_MAX_EDITS = int(os.getenv("INTENT_FUZZY_MAX_EDITS", "2"))
+# A word that is another plus one of these ("unsafe", "women") means its opposite
+_OPPOSITE_PREFIXES = ("un", "in", "im", "ir", "il", "dis", "non", "anti", "wo", "fe")
+_NEGATIONS = frozenset("no not never dont don't isnt isn't cant can't without na hoina chaina".split())
+
+_END = object()  # trie key marking the end of a phrase
+
+
+def _edit_distance(a, b, limit):
+    """Levenshtein distance between a and b, or limit + 1 once it exceeds limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def _typo_edits(word, phrase_word):
+    """Edits turning phrase_word into word if that reads as a typo, else None."""
+    if word == phrase_word:
+        return 0
+    if len(phrase_word) <= 2 or word in _NEGATIONS or phrase_word in _NEGATIONS:
+        return None
+    for prefix in _OPPOSITE_PREFIXES:
+        if word == prefix + phrase_word or phrase_word == prefix + word:
+            return None
+    limit = 1 if len(phrase_word) <= 4 else INTENT_FUZZY_MAX_EDITS
+    edits = _edit_distance(word, phrase_word, limit)
+    return edits if edits <= limit else None
+
+
+def normalize(text):
+    """NFC, lower case, punctuation removed, whitespace collapsed."""
+    text = unicodedata.normalize("NFC", str(text)).lower()
+    text = "".join(" " if unicodedata.category(ch).startswith("P") else ch for ch in text)
+    return " ".join(text.split())
+
+
+class IntentMatcher:
+    def __init__(self, tables):
+        """tables: {language: {phrase: answer}}, e.g. the contents of chatbot_data.json."""
+        self.languages = list(tables)
+        self._exact = {}  # (language, normalized phrase) -> (phrase, answer)
+        self._trie = {}
+        self._phrases = {}  # (language, word count) -> phrases as word tuples, for fuzzy lookup
+        for language, entries in tables.items():
+            for phrase, answer in entries.items():
+                key = normalize(phrase)
+                if not key:
+                    continue
+                self._exact[(language, key)] = (phrase, answer)
+                self._phrases.setdefault((language, len(key.split())), []).append(tuple(key.split()))
+                node = self._trie
+                for word in key.split():
+                    node = node.setdefault(word, {})
+                node.setdefault(_END, set()).add(language)
+
+        self.lookups = 0
+        self.by_match = Counter()
+        self.by_intent = Counter()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path=INTENTS_PATH):
+        with open(path, encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def _longest_phrase(self, words):
+        """Longest curated phrase occurring in words: (start, end, languages) or None."""
+        best = None
+        for start in range(len(words)):
+            node = self._trie
+            for end in range(start + 1, len(words) + 1):
+                node = node.get(words[end - 1])
+                if node is None:
+                    break
+                if _END in node and (best is None or end - start > best[1] - best[0]):
+                    best = (start, end, node[_END])
+        return best
+
+    def _lookup(self, query, order):
+        for language in order:
+            if (language, query) in self._exact:
+                return (language, query), "exact"
+
+        words = query.split()
+        found = self._longest_phrase(words)
+        if found:
+            start, end, languages = found
+            if all(word in _FILLER_WORDS for word in words[:start] + words[end:]):
+                phrase = " ".join(words[start:end])
+                return (next(language for language in order if language in languages), phrase), "phrase"
+
+        for language in order:
+            close = self._closest_phrase(words, language)
+            if close:
+                return (language, close), "fuzzy"
+        return None, None
+
+    def _closest_phrase(self, words, language):
+        """The phrase of the same length that words are a typo of (fewest edits), or None."""
+        best, best_edits = None, None
+        for phrase in self._phrases.get((language, len(words)), ()):
+            total = 0
+            for word, phrase_word in zip(words, phrase):
+                edits = _typo_edits(word, phrase_word)
+                if edits is None:
+                    break
+                total += edits
+            else:
+                if best_edits is None or total < best_edits:
+                    best, best_edits = " ".join(phrase), total
+        return best
+
+    def match(self, text, language=None):
+        """
+        Return {"intent", "language", "answer", "match"} for a curated
+        question, or None. language ("english"/"nepali") is searched first.
+        """
+        query = normalize(text)
+        order = sorted(self.languages, key=lambda name: name != language)
+        key, how = self._lookup(query, order) if query else (None, None)
+        with self._lock:
+            self.lookups += 1
+            if key is None:
+                return None
+            self.by_match[how] += 1
+            self.by_intent[f"{key[0]}:{key[1]}"] += 1
+        phrase, answer = self._exact[key]
+        return {"intent": phrase, "language": key[0], "answer": answer, "match": how}
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits = sum(self.by_match.values())
+            return {
+                "lookups": self.lookups,
+                "hits": hits,
+                "hit_rate": hits / self.lookups if self.lookups else 0.0,
+                "by_match": dict(self.by_match),
+                "top_intents": dict(self.by_intent.most_common(10)),
+            }
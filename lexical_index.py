@@ -0,0 +1,155 @@
+# lexical_index.py
+"""
+BM25 inverted index over the stored questions.
+
+Complements the English-centric sentence encoder: exact and near-exact
+Devanagari (or English) wordings are found by their terms, without running
+the model. Built by rag.py and saved as one .npz of flat arrays:
+
+    terms      sorted vocabulary
+    indptr     postings of terms[i] are [indptr[i], indptr[i + 1])
+    docs       document positions, ascending within each term
+    weights    precomputed BM25 weight of the term in that document
+    row_ids    stable row id of each document position
+    doc_terms  number of distinct terms per document
+"""
+import math
+import re
+import unicodedata
+
+import numpy as np
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Word characters plus the Devanagari vowel signs, virama and nasal marks
+# (combining marks, which \w does not match); dandas are excluded
+_TOKEN = re.compile(r"[\w\u0900-\u0903\u093a-\u094f\u0951-\u0957\u0962\u0963]+")
+# Zero-width (non-)joiners change rendering only, not the word
+_ZERO_WIDTH = dict.fromkeys([0x200B, 0x200C, 0x200D])
+# Common Nepali case endings and the plural marker, longest first, so that
+# "नियोजनका" and "नियोजनको" index as "नियोजन"
+_NEPALI_SUFFIXES = sorted(
+    ["हरूलाई", "हरूको", "हरूका", "हरूमा", "हरूले", "हरू", "लाई", "बाट", "सँग", "देखि",
+     "को", "का", "की", "ले", "मा"],
+    key=len, reverse=True,
+)
+
+
+def _strip_suffix(token):
+    if not ("\u0900" <= token[0] <= "\u097f"):
+        return token
+    for suffix in _NEPALI_SUFFIXES:
+        if token.endswith(suffix) and len(token) - len(suffix) >= 2:
+            return token[:-len(suffix)]
+    return token
+
+
+def tokenize(text):
+    """Normalized terms of a text: NFC, lower case, Devanagari-aware split, light Nepali stemming."""
+    text = unicodedata.normalize("NFC", str(text)).translate(_ZERO_WIDTH).lower()
+    return [_strip_suffix(token) for token in _TOKEN.findall(text)]
+
+
+class LexicalIndex:
+    def __init__(self, terms, indptr, docs, weights, row_ids, doc_terms):
+        self.terms = terms
+        self.indptr = indptr
+        self.docs = docs
+        self.weights = weights
+        self.row_ids = row_ids
+        self.doc_terms = doc_terms
+        self._term_ids = {term: i for i, term in enumerate(terms.tolist())}
+
+    def __len__(self):
+        return len(self.row_ids)
+
+    @classmethod
+    def build(cls, row_ids, texts, k1=BM25_K1, b=BM25_B):
+        """Index texts (one document each) under their row ids."""
+        doc_counts = []
+        for text in texts:
+            counts = {}
+            for token in tokenize(text):
+                counts[token] = counts.get(token, 0) + 1
+            doc_counts.append(counts)
+
+        n = len(doc_counts)
+        lengths = np.array([sum(c.values()) for c in doc_counts], dtype="float64")
+        avg_length = lengths.mean() if n and lengths.sum() else 1.0
+        postings = {}
+        for doc, counts in enumerate(doc_counts):
+            for term, tf in counts.items():
+                postings.setdefault(term, []).append((doc, tf))
+
+        terms = sorted(postings)
+        indptr = np.zeros(len(terms) + 1, dtype="int64")
+        docs, weights = [], []
+        for i, term in enumerate(terms):
+            entries = postings[term]
+            idf = math.log(1 + (n - len(entries) + 0.5) / (len(entries) + 0.5))
+            for doc, tf in entries:
+                norm = k1 * (1 - b + b * lengths[doc] / avg_length)
+                docs.append(doc)
+                weights.append(idf * tf * (k1 + 1) / (tf + norm))
+            indptr[i + 1] = len(docs)
+
+        return cls(
+            terms=np.array(terms, dtype=str),
+            indptr=indptr,
+            docs=np.asarray(docs, dtype="int32"),
+            weights=np.asarray(weights, dtype="float32"),
+            row_ids=np.asarray(row_ids, dtype="int64"),
+            doc_terms=np.array([len(c) for c in doc_counts], dtype="int32"),
+        )
+
+    def save(self, f):
+        np.savez(f, terms=self.terms, indptr=self.indptr, docs=self.docs, weights=self.weights,
+                 row_ids=self.row_ids, doc_terms=self.doc_terms)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(**{key: data[key] for key in data.files})
+
+    def _postings(self, term):
+        i = self._term_ids.get(term)
+        if i is None:
+            return None
+        return slice(self.indptr[i], self.indptr[i + 1])
+
+    def search(self, query, k=10):
+        """
+        Return (row_ids, scores, overlap) for the top k documents, best first.
+
+        overlap is the Jaccard overlap between the query's terms and the best
+        document's terms (1.0 = same words), or 0.0 when several documents
+        tie for first place. Callers use it to decide whether the lexical
+        match is confident enough on its own.
+        """
+        query_terms = set(tokenize(query))
+        spans = [span for span in map(self._postings, query_terms) if span is not None]
+        if not spans or k <= 0:
+            return np.empty(0, dtype="int64"), np.empty(0, dtype="float32"), 0.0
+
+        scores = np.zeros(len(self.row_ids), dtype="float32")
+        for span in spans:
+            # a term occurs once per document's posting list, so += is safe
+            scores[self.docs[span]] += self.weights[span]
+        k = min(k, int(np.count_nonzero(scores)))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return self.row_ids[top], scores[top], self._overlap(query_terms, spans, top, scores)
+
+    def _overlap(self, query_terms, spans, top, scores):
+        """Jaccard overlap between the query terms and the best document's terms (0 if ambiguous)."""
+        best = top[0]
+        if len(top) > 1 and scores[top[1]] >= scores[best] * 0.999:
+            return 0.0  # tie: several stored questions match equally well
+        matched = sum(1 for span in spans if _contains(self.docs[span], best))
+        return matched / (len(query_terms) + int(self.doc_terms[best]) - matched)
+
+
+def _contains(sorted_docs, doc):
+    pos = np.searchsorted(sorted_docs, doc)
+    return pos < len(sorted_docs) and sorted_docs[pos] == doc
@@ -0,0 +1,196 @@
+# llm_client.py
+import asyncio
+import json
+import logging
+import os
+import time
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Iterator, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import metrics
+
+log = logging.getLogger(__name__)
+
+OLLAMA_URL = os.getenv("OLLAMA_URL", "http://localhost:11434")
+OLLAMA_MODEL = os.getenv("OLLAMA_MODEL", "mistral:latest")
+OLLAMA_TIMEOUT = float(os.getenv("OLLAMA_TIMEOUT", "120"))
+
+# At most this many generations run against Ollama at once ...
+OLLAMA_MAX_CONCURRENT = int(os.getenv("OLLAMA_MAX_CONCURRENT", "2"))
+# ... up to this many more wait for a free slot ...
+OLLAMA_MAX_WAITING = int(os.getenv("OLLAMA_MAX_WAITING", "16"))
+# ... for no longer than this many seconds before giving up.
+OLLAMA_QUEUE_TIMEOUT = float(os.getenv("OLLAMA_QUEUE_TIMEOUT", "30"))
+
+
+def _log_usage(final: dict):
+    """
+    One line per generation with Ollama's token accounting. prompt_eval_count
+    only counts tokens that had to be evaluated, so a reused system prefix
+    shows up as a smaller number here.
+    """
+    prompt_tokens = final.get("prompt_eval_count", 0)
+    completion_tokens = final.get("eval_count", 0)
+    LLM_TOKENS.inc("prompt", amount=prompt_tokens)
+    LLM_TOKENS.inc("completion", amount=completion_tokens)
+    if log.isEnabledFor(logging.INFO):
+        prefill_ms = final.get("prompt_eval_duration", 0) / 1e6
+        eval_seconds = final.get("eval_duration", 0) / 1e9
+        rate = completion_tokens / eval_seconds if eval_seconds else 0.0
+        log.info("prompt_tokens=%d completion_tokens=%d prefill_ms=%.0f tokens_per_s=%.1f",
+                 prompt_tokens, completion_tokens, prefill_ms, rate)
+
+
+LLM_TOKENS = metrics.register(metrics.Counter(
+    "familycare_llm_tokens_total", "Tokens evaluated by Ollama.", labels=("kind",)))
+
+
+class LLMBusyError(RuntimeError):
+    """Raised when no generation slot became free in time."""
+
+
+class OllamaClient:
+    """
+    Thread-safe client for Ollama's /api/generate endpoint.
+
+    One keep-alive requests.Session is shared by every call, and a semaphore
+    caps how many generations are in flight. Callers beyond that limit wait
+    in a bounded queue and get LLMBusyError when it is full or the wait
+    times out, so request threads are never parked on Ollama indefinitely.
+    """
+
+    def __init__(
+        self,
+        base_url: str = OLLAMA_URL,
+        model: str = OLLAMA_MODEL,
+        max_concurrent: int = OLLAMA_MAX_CONCURRENT,
+        max_waiting: int = OLLAMA_MAX_WAITING,
+        queue_timeout: float = OLLAMA_QUEUE_TIMEOUT,
+        timeout: float = OLLAMA_TIMEOUT,
+    ):
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_waiting = max(0, max_waiting)
+        self.queue_timeout = queue_timeout
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.max_concurrent)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._slots = threading.BoundedSemaphore(self.max_concurrent)
+        self._lock = threading.Lock()
+        self._waiting = 0
+        self._submitted = 0  # submit() calls queued on or running in the executor
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrent + self.max_waiting,
+            thread_name_prefix="ollama",
+        )
+
+    def _acquire_slot(self):
+        with self._lock:
+            if self._slots.acquire(blocking=False):
+                return
+            if self._waiting >= self.max_waiting:
+                raise LLMBusyError("Too many generations queued for Ollama")
+            self._waiting += 1
+        try:
+            acquired = self._slots.acquire(timeout=self.queue_timeout)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+        if not acquired:
+            raise LLMBusyError(f"No Ollama slot became free within {self.queue_timeout:.0f}s")
+
+    def stream(self, prompt: str, model: Optional[str] = None, stats: Optional[dict] = None,
+               **fields) -> Iterator[str]:
+        """
+        Yield response fragments as Ollama produces them.
+
+        A generation slot is held from the first iteration until the
+        generator is exhausted or closed. Extra keyword arguments are sent
+        as top-level /api/generate fields (e.g. options, system). If stats
+        is given it is filled with the final chunk's fields (token counts,
+        durations, context) once the generation completes.
+        """
+        payload = {"model": model or self.model, "prompt": prompt, "stream": True, **fields}
+
+        with metrics.span("llm_queue_wait"):
+            self._acquire_slot()
+        try:
+            started = time.perf_counter()
+            first_token = True
+            response = self.session.post(
+                f"{self.base_url}/api/generate",
+                json=payload,
+                stream=True,
+                timeout=self.timeout,
+            )
+            try:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    try:
+                        chunk = json.loads(line.decode("utf-8"))
+                    except json.JSONDecodeError as decode_error:
+                        log.warning("Skipping undecodable Ollama line: %s", decode_error)
+                        continue
+                    fragment = chunk.get("response", "")
+                    if fragment:
+                        if first_token:
+                            metrics.observe("llm_first_token", time.perf_counter() - started)
+                            first_token = False
+                        yield fragment
+                    if chunk.get("done"):
+                        metrics.observe("llm_generate", time.perf_counter() - started)
+                        final = {key: value for key, value in chunk.items() if key != "response"}
+                        if stats is not None:
+                            stats.update(final)
+                        _log_usage(final)
+                        break
+            finally:
+                response.close()
+        finally:
+            self._slots.release()
+
+    def generate(self, prompt: str, model: Optional[str] = None, **fields) -> str:
+        """Run a generation to completion and return the full text."""
+        return "".join(self.stream(prompt, model=model, **fields))
+
+    def submit(self, prompt: str, model: Optional[str] = None, **fields) -> Future:
+        """
+        Run generate() on the client's worker pool and return a Future.
+
+        Raises LLMBusyError straight away when every pool thread is taken,
+        instead of leaving the call in the executor's unbounded queue.
+        """
+        with self._lock:
+            if self._submitted >= self.max_concurrent + self.max_waiting:
+                raise LLMBusyError("Too many generations queued for Ollama")
+            self._submitted += 1
+        try:
+            future = self._executor.submit(self.generate, prompt, model, **fields)
+        except Exception:
+            self._release_submitted()
+            raise
+        future.add_done_callback(lambda _: self._release_submitted())
+        return future
+
+    def _release_submitted(self):
+        with self._lock:
+            self._submitted -= 1
+
+    async def agenerate(self, prompt: str, model: Optional[str] = None, **fields) -> str:
+        """Awaitable generate() that keeps the event loop free while Ollama works."""
+        return await asyncio.wrap_future(self.submit(prompt, model, **fields))
+
+
+# Shared client used by the web app and the CLI chatbot
+client = OllamaClient()
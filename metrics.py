@@ -0,0 +1,210 @@
+# metrics.py
+"""
+In-process latency histograms and counters, rendered in the Prometheus text
+format for /metrics.
+
+    with metrics.span("faiss_search"):
+        index.search(...)
+
+Every span lands in the familycare_stage_seconds histogram under its stage
+label. Work done in ASR worker processes is timed inside metrics.capture()
+and the (stage, seconds) pairs travel back with the job result, where the
+web process records them with metrics.observe().
+"""
+import bisect
+import functools
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+log = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _label_text(names, values):
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{str(value)}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        slot = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            if slot < len(self.buckets):
+                series[slot] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        for label_values, values in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                labels = _label_text(self.labels + ("le",), label_values + (repr(float(bound)),))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _label_text(self.labels + ("le",), label_values + ("+Inf",))
+            lines.append(f"{self.name}_bucket{labels} {values[-1]}")
+            base = _label_text(self.labels, label_values)
+            lines.append(f"{self.name}_sum{base} {values[-2]:.6f}")
+            lines.append(f"{self.name}_count{base} {values[-1]}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = dict(self._values)
+        for label_values, value in sorted(values.items()):
+            lines.append(f"{self.name}{_label_text(self.labels, label_values)} {value}")
+        return lines
+
+
+STAGE_SECONDS = Histogram("familycare_stage_seconds", "Time spent in each request stage.", labels=("stage",))
+REPLIES = Counter("familycare_replies_total", "Chat replies by where the answer came from.", labels=("source",))
+
+_METRICS = [STAGE_SECONDS, REPLIES]
+# Callables returning [(name, type, help, value, {label: value})] at scrape time
+_COLLECTORS = []
+_local = threading.local()
+
+
+def observe(stage, seconds):
+    """Record one timing; diverted to the active capture() list, if any."""
+    sink = getattr(_local, "capture", None)
+    if sink is not None:
+        sink.append((stage, seconds))
+        return
+    STAGE_SECONDS.observe(seconds, stage)
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug("%s took %.1f ms", stage, seconds * 1000)
+
+
+@contextmanager
+def span(stage):
+    """Time the enclosed block as one observation of stage."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - started)
+
+
+def timed(stage):
+    """Decorator form of span()."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+@contextmanager
+def capture():
+    """
+    Collect spans from this thread into a list instead of the histograms,
+    e.g. in a worker process whose registry nobody scrapes.
+    """
+    timings = []
+    previous = getattr(_local, "capture", None)
+    _local.capture = timings
+    try:
+        yield timings
+    finally:
+        _local.capture = previous
+
+
+def register(metric):
+    """Add a Histogram or Counter defined elsewhere to /metrics."""
+    _METRICS.append(metric)
+    return metric
+
+
+def register_collector(collect):
+    _COLLECTORS.append(collect)
+
+
+def process_memory(pid="self"):
+    """
+    Memory of a process in bytes from /proc/<pid>/smaps_rollup: rss, pss
+    (shared pages split between the processes mapping them), shared and
+    private. Empty where smaps_rollup is unavailable (non-Linux).
+    """
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) == 3 and parts[2] == "kB":
+                    fields[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    except OSError:
+        return {}
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "shared": fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0),
+        "private": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+    }
+
+
+def _collect_process():
+    pid = str(os.getpid())
+    return [("familycare_process_memory_bytes", "gauge",
+             "Memory of the process serving this scrape (one worker when pre-forked).",
+             value, {"kind": kind, "pid": pid})
+            for kind, value in process_memory().items()]
+
+
+register_collector(_collect_process)
+
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in _METRICS:
+        lines += metric.render()
+    for collect in _COLLECTORS:
+        try:
+            samples = collect()
+        except Exception:
+            log.exception("Metrics collector failed")
+            continue
+        described = set()
+        for name, kind, help_text, value, labels in samples:
+            if name not in described:
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+                described.add(name)
+            lines.append(f"{name}{_label_text(tuple(labels), tuple(labels.values()))} {value}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,88 @@
+# prompts.py
+"""
+Prompt text for the chatbot.
+
+The fixed instructions go to Ollama once, in the /api/generate "system"
+field. They render identically at the start of every request, so Ollama
+can reuse the already-evaluated prefix instead of prefilling it again.
+Only the short per-request part below changes between calls.
+"""
+import os
+
+# The model's context window, requested as options.num_ctx on every call
+# (Ollama's own default is smaller). The reference-text and conversation
+# budgets are derived from it, so a prompt always fits and Ollama never
+# silently drops its start, system prompt included.
+CONVERSATION_MAX_TOKENS = int(os.getenv("CONVERSATION_MAX_TOKENS", "4096"))
+
+SYSTEM_PROMPT = """
+You are *FamilyCare*, a professional AI health assistant specializing in
+family planning, reproductive health, and contraception awareness.
+
+ Your purpose:
+To educate users with clear, accurate, and empathetic information about
+topics such as family planning, birth control, reproductive rights,
+maternal health, and safe sexual practices.
+
+ Communication Rules:
+1. Detect the language of the user automatically.
+   - If the user writes in Nepali, respond naturally in Nepali.
+   - If the user writes in English, respond in clear and simple English.
+2. Use a warm, respectful, and supportive tone.
+3. Provide information in an *organized* and *easy-to-read* structure.
+   - Use short paragraphs or bullet points when possible.
+   - If a list of options or steps is needed, number them clearly.
+4. Focus *only* on family planning, sexual and reproductive health.
+   - If a question is unrelated, reply briefly:
+     "I'm sorry, but I can only answer questions related to family planning and reproductive health."
+5. Always ensure your answers are factually correct, responsible, and culturally sensitive.
+6. When reference information is given with a question, base your answer on it.
+
+ Example:
+User: What are the types of contraceptive methods?
+Answer (English):
+There are several types of contraceptive methods:
+1. Barrier methods: Condoms, diaphragms.
+2. Hormonal methods: Pills, injections, implants.
+3. Intrauterine devices (IUDs): Inserted into the uterus.
+4. Natural methods: Calendar or fertility tracking.
+5. Permanent methods: Vasectomy or tubal ligation.
+
+User: परिवार नियोजनका उपायहरू के के हुन्?
+Answer (Nepali):
+परिवार नियोजनका मुख्य उपायहरू यस प्रकार छन्:
+1. अवरोधक उपाय: कण्डम, डायाफ्राम।
+2. हर्मोनल उपाय: पिल, इन्जेक्सन, इम्प्लान्ट।
+3. आईयूडी: गर्भाशयमा राखिने सानो उपकरण।
+4. स्वाभाविक उपाय: महिनावारीको समय मिलाएर सम्बन्ध राख्ने।
+5. स्थायी उपाय: नसबन्दी (पुरुष वा महिला)।
+""".strip()
+
+
+def build_prompt(user_message: str, context: str = "", history: str = "") -> str:
+    """
+    The per-request part: earlier turns of the conversation when they are
+    not carried by Ollama's context, retrieved reference text (if any) and
+    the question.
+    """
+    parts = []
+    if history:
+        parts.append(f"Conversation so far:\n{history.strip()}")
+    if context:
+        parts.append(f"Reference information:\n{context.strip()}")
+    parts.append(f"User: {user_message.strip()}")
+    return "\n\n".join(parts)
+
+
+def generation_fields(conversation_context=None) -> dict:
+    """
+    Extra /api/generate fields for a chatbot request. A continued
+    conversation sends Ollama's previous context instead of the system
+    prompt, which that context already starts with.
+    """
+    fields = {"options": {"num_ctx": CONVERSATION_MAX_TOKENS}}
+    if conversation_context:
+        fields["context"] = list(conversation_context)
+    else:
+        fields["system"] = SYSTEM_PROMPT
+    return fields
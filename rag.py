@@ -1,31 +1,326 @@
-import pandas as pd
+import argparse
+import hashlib
+import json
+import math
+import os
+import time
+
 from sentence_transformers import SentenceTransformer
 import faiss
 import numpy as np
-import os
 
-# Ensure data folder exists
-os.makedirs("data", exist_ok=True)
+from answer_store import write_store
+from lexical_index import LexicalIndex
+
+DATA_DIR = "data"
+CSV_PATH = os.path.join(DATA_DIR, "qa.csv")
+INDEX_PATH = os.path.join(DATA_DIR, "faiss_index.bin")
+INDEX_CONFIG_PATH = os.path.join(DATA_DIR, "index_config.json")
+MANIFEST_PATH = os.path.join(DATA_DIR, "index_manifest.json")
+VECTORS_PATH = os.path.join(DATA_DIR, "embeddings.npy")
+VECTOR_IDS_PATH = os.path.join(DATA_DIR, "embedding_ids.npy")
+ANSWER_STORE_PATH = os.path.join(DATA_DIR, "answers.store")
+LEXICAL_INDEX_PATH = os.path.join(DATA_DIR, "lexical_index.npz")
+MODEL_NAME = "all-MiniLM-L6-v2"
+
+INDEX_TYPES = ("flat", "hnsw", "ivf")
+
+# An IVF index is retrained once the corpus has grown this much past its training set
+IVF_RETRAIN_GROWTH = 2.0
+
+
+def row_id(question, occurrence=0):
+    """
+    Stable 63-bit id for the n-th row carrying this question text.
+
+    The embedding only depends on the question, so an edited answer keeps
+    its id (and vector) while an edited question becomes a delete + add.
+    """
+    digest = hashlib.blake2b(f"{occurrence}\x00{question}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") & 0x7FFF_FFFF_FFFF_FFFF
+
+
+def row_hash(question, answer):
+    return hashlib.blake2b(f"{question}\x00{answer}".encode("utf-8"), digest_size=16).hexdigest()
+
+
+def load_rows(csv_path=CSV_PATH):
+    """Read the Q&A sheet and attach a stable id and content hash to every row."""
+    # pandas is only needed at build time; the app reads the answer store
+    import pandas as pd
+
+    raw = pd.read_csv(csv_path, dtype=str, keep_default_na=False)
+    # Answers containing unquoted commas spill into the unnamed trailing
+    # columns; stitch them back together and drop the empty padding
+    overflow = raw.columns[2:]
+    answers = raw["Answers"]
+    if len(overflow):
+        answers = raw[["Answers", *overflow]].apply(
+            lambda cells: ", ".join(c.strip() for c in cells if c.strip()), axis=1)
+    df = pd.DataFrame({"Questions": raw["Questions"].str.strip(), "Answers": answers})
+    df = df[df["Questions"] != ""].copy()
+
+    occurrences = df.groupby("Questions").cumcount()
+    df["id"] = [row_id(q, n) for q, n in zip(df["Questions"], occurrences)]
+    df["hash"] = [row_hash(q, a) for q, a in zip(df["Questions"], df["Answers"])]
+    return df.set_index("id", drop=False)
+
+
+def embed(model, texts, batch_size=64, show_progress=False):
+    """Encode texts into unit-length float32 vectors so inner product == cosine."""
+    vectors = model.encode(texts, batch_size=batch_size, convert_to_numpy=True,
+                           normalize_embeddings=True, show_progress_bar=show_progress)
+    return np.ascontiguousarray(vectors, dtype="float32").reshape(len(texts), -1)
+
+
+def build_index(embeddings, index_type="flat", hnsw_m=32, ef_construction=200, nlist=None, ids=None):
+    """
+    Build an inner-product FAISS index over normalised embeddings.
+
+    flat - exact search, the reference for recall
+    hnsw - graph index, tune efSearch at query time
+    ivf  - inverted lists over k-means cells, tune nprobe at query time
+
+    With ids, the index returns those ids instead of row positions and
+    supports remove_ids (except HNSW, which has to be rebuilt).
+    """
+    dimension = embeddings.shape[1]
+    if index_type == "flat":
+        index = faiss.IndexFlatIP(dimension)
+    elif index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, hnsw_m, faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = ef_construction
+    elif index_type == "ivf":
+        # Rule of thumb: about 4 * sqrt(N) cells, but never more than a cell per ~39 training points
+        nlist = nlist or max(1, min(int(4 * math.sqrt(len(embeddings))), len(embeddings) // 39))
+        quantizer = faiss.IndexFlatIP(dimension)
+        index = faiss.IndexIVFFlat(quantizer, dimension, nlist, faiss.METRIC_INNER_PRODUCT)
+        index.train(embeddings)
+    else:
+        raise ValueError(f"Unknown index type {index_type!r}; expected one of {INDEX_TYPES}")
+
+    if ids is None:
+        index.add(embeddings)
+        return index
+    if index_type != "ivf":
+        index = faiss.IndexIDMap2(index)
+    index.add_with_ids(embeddings, np.asarray(ids, dtype="int64"))
+    return index
+
+
+def apply_search_params(index, nprobe=None, ef_search=None):
+    """Set query-time knobs; ParameterSpace ignores the ones an index type lacks."""
+    params = faiss.ParameterSpace()
+    if nprobe and "nprobe" in _tunables(index):
+        params.set_index_parameter(index, "nprobe", int(nprobe))
+    if ef_search and "efSearch" in _tunables(index):
+        params.set_index_parameter(index, "efSearch", int(ef_search))
+
+
+def _tunables(index):
+    base = faiss.downcast_index(index.index) if hasattr(index, "id_map") else index
+    if isinstance(base, faiss.IndexHNSW):
+        return {"efSearch"}
+    if isinstance(base, faiss.IndexIVF):
+        return {"nprobe"}
+    return set()
+
+
+def recall_latency_report(embeddings, k=5, n_queries=500, noise=0.05, seed=0,
+                          nprobe_values=(1, 4, 8, 16, 32), ef_values=(16, 32, 64, 128)):
+    """
+    Compare each index type against exact search.
+
+    Queries are stored question vectors with a little Gaussian noise, so they
+    behave like paraphrases rather than exact duplicates. Recall@k is the share
+    of the exact top-k that each configuration also returns.
+    """
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(len(embeddings), size=min(n_queries, len(embeddings)), replace=False)
+    queries = embeddings[picks] + rng.normal(scale=noise, size=(len(picks), embeddings.shape[1])).astype("float32")
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    exact = build_index(embeddings, "flat")
+    _, truth = exact.search(queries, k)
+
+    def measure(index, label, **params):
+        apply_search_params(index, **params)
+        start = time.perf_counter()
+        _, found = index.search(queries, k)
+        elapsed = time.perf_counter() - start
+        recall = np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)])
+        return {"config": label, "recall_at_k": round(float(recall), 4),
+                "ms_per_query": round(elapsed * 1000 / len(queries), 4), **params}
+
+    rows = [measure(exact, "flat")]
+    hnsw = build_index(embeddings, "hnsw")
+    rows += [measure(hnsw, "hnsw", ef_search=ef) for ef in ef_values]
+    ivf = build_index(embeddings, "ivf")
+    rows += [measure(ivf, "ivf", nprobe=n) for n in nprobe_values if n <= ivf.nlist]
+    return {"k": k, "queries": len(queries), "vectors": len(embeddings), "results": rows}
+
+
+def _atomic_write(path, write):
+    """Write through a temp file and rename, so readers never see a partial artifact."""
+    tmp_path = f"{path}.tmp"
+    write(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _save_npy(array):
+    def write(path):
+        with open(path, "wb") as f:
+            np.save(f, array)
+    return write
+
+
+def _save_lexical(lexical):
+    def write(path):
+        with open(path, "wb") as f:
+            lexical.save(f)
+    return write
+
+
+def _save_json(payload):
+    def write(path):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(payload, f, indent=2)
+    return write
+
+
+def load_previous_build(index_type):
+    """
+    Return (manifest, ids, vectors, index) from the last build, or None when
+    it is missing or was made with another model. index is None when the
+    stored vectors can be reused but the index type changed.
+    """
+    paths = (MANIFEST_PATH, VECTORS_PATH, VECTOR_IDS_PATH, INDEX_PATH)
+    if not all(os.path.exists(p) for p in paths):
+        return None
+    with open(MANIFEST_PATH, encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("model") != MODEL_NAME:
+        return None
+
+    ids = np.load(VECTOR_IDS_PATH)
+    vectors = np.load(VECTORS_PATH)
+    # A crash between artifact renames would leave these out of step
+    if not len(ids) == len(vectors) == len(manifest.get("rows", {})):
+        return None
+    index = None
+    if manifest.get("index_type") == index_type:
+        index = faiss.read_index(INDEX_PATH)
+        if index.ntotal != len(ids):
+            index = None
+    return manifest, ids, vectors, index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or incrementally update the FAISS index over data/qa.csv")
+    parser.add_argument("--csv", default=CSV_PATH)
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default=os.getenv("RAG_INDEX_TYPE", "flat"))
+    parser.add_argument("--hnsw-m", type=int, default=32)
+    parser.add_argument("--ef-construction", type=int, default=200)
+    parser.add_argument("--ef-search", type=int, default=64)
+    parser.add_argument("--nlist", type=int, default=None)
+    parser.add_argument("--nprobe", type=int, default=8)
+    parser.add_argument("--batch-size", type=int, default=64, help="sentences per encode batch")
+    parser.add_argument("--full", action="store_true", help="ignore the manifest and re-embed every row")
+    parser.add_argument("--quiet", action="store_true", help="no progress bar")
+    parser.add_argument("--report", action="store_true", help="also print a recall-vs-latency report")
+    parser.add_argument("--report-out", default=None, help="also write the report as JSON to this path")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+
+    # Ensure data folder exists
+    os.makedirs(DATA_DIR, exist_ok=True)
+
+    # Load CSV
+    df = load_rows(args.csv)
+    new_rows = dict(zip(df["id"].tolist(), df["hash"].tolist()))
+
+    previous = None if args.full else load_previous_build(args.index_type)
+    if previous:
+        manifest, old_ids, old_vectors, index = previous
+        old_rows = {int(k): v for k, v in manifest["rows"].items()}
+    else:
+        manifest, old_ids, old_vectors, index = {}, np.empty(0, dtype="int64"), None, None
+        old_rows = {}
+
+    added = [i for i in new_rows if i not in old_rows]
+    removed = [i for i in old_rows if i not in new_rows]
+    changed = [i for i in new_rows if i in old_rows and old_rows[i] != new_rows[i]]
+    print(f"{len(df)} rows: {len(added)} added, {len(removed)} removed, "
+          f"{len(changed)} answer-only changes, {len(new_rows) - len(added) - len(changed)} unchanged")
+
+    # Create embeddings, only for rows we have not seen before
+    if added:
+        model = SentenceTransformer(MODEL_NAME)
+        added_vectors = embed(model, df.loc[added, "Questions"].tolist(),
+                              batch_size=args.batch_size, show_progress=not args.quiet)
+    else:
+        added_vectors = None
 
-# Load CSV
-df = pd.read_csv("data/qa.csv")
+    keep = ~np.isin(old_ids, np.asarray(removed, dtype="int64")) if len(old_ids) else np.empty(0, dtype=bool)
+    ids = np.asarray(old_ids[keep].tolist() + added, dtype="int64")
+    parts = [v for v in (old_vectors[keep] if old_vectors is not None else None, added_vectors) if v is not None]
+    vectors = np.concatenate(parts) if parts else np.empty((0, 0), dtype="float32")
 
-# Load model
-model = SentenceTransformer("all-MiniLM-L6-v2")
+    # Update the FAISS index in place where the index type allows it
+    trained_on = manifest.get("trained_on", 0)
+    rebuild = (
+        index is None
+        or (removed and args.index_type == "hnsw")
+        or (args.index_type == "ivf" and len(ids) > IVF_RETRAIN_GROWTH * max(trained_on, 1))
+    )
+    if rebuild:
+        index = build_index(vectors, args.index_type, hnsw_m=args.hnsw_m,
+                            ef_construction=args.ef_construction, nlist=args.nlist, ids=ids)
+        trained_on = len(ids)
+    else:
+        if removed:
+            index.remove_ids(np.asarray(removed, dtype="int64"))
+        if added:
+            index.add_with_ids(added_vectors, np.asarray(added, dtype="int64"))
 
-# Create embeddings
-questions = df["Questions"].tolist()
-embeddings = model.encode(questions, convert_to_numpy=True)
+    if args.report:
+        report = recall_latency_report(vectors)
+        print(f"{'config':<8} {'param':>10} {'recall@' + str(report['k']):>10} {'ms/query':>10}")
+        for row in report["results"]:
+            param = next((f"{key}={row[key]}" for key in ("nprobe", "ef_search") if key in row), "-")
+            print(f"{row['config']:<8} {param:>10} {row['recall_at_k']:>10.4f} {row['ms_per_query']:>10.4f}")
+        if args.report_out:
+            _atomic_write(args.report_out, _save_json(report))
 
-# Build FAISS index
-dimension = embeddings.shape[1]
-index = faiss.IndexFlatL2(dimension)
-index.add(embeddings)
+    # Save every artifact atomically; the manifest goes last so it only ever
+    # describes a complete build
+    _atomic_write(INDEX_PATH, lambda path: faiss.write_index(index, path))
+    _atomic_write(VECTORS_PATH, _save_npy(vectors))
+    _atomic_write(VECTOR_IDS_PATH, _save_npy(ids))
+    write_store(ANSWER_STORE_PATH, df["id"].to_numpy(), df["Questions"].tolist(), df["Answers"].tolist())
+    # BM25 statistics depend on every row, so the lexical index is always rebuilt (no model needed)
+    lexical = LexicalIndex.build(df["id"].to_numpy(), df["Questions"].tolist())
+    _atomic_write(LEXICAL_INDEX_PATH, _save_lexical(lexical))
+    _atomic_write(INDEX_CONFIG_PATH, _save_json({
+        "index_type": args.index_type,
+        "metric": "inner_product",
+        "normalized": True,
+        "model": MODEL_NAME,
+        "nprobe": args.nprobe,
+        "ef_search": args.ef_search,
+        "count": int(index.ntotal),
+    }))
+    _atomic_write(MANIFEST_PATH, _save_json({
+        "model": MODEL_NAME,
+        "index_type": args.index_type,
+        "trained_on": trained_on,
+        "rows": {str(k): v for k, v in new_rows.items()},
+    }))
 
-# Save FAISS index
-faiss.write_index(index, "data/faiss_index.bin")
+    print(f"FAISS index ({args.index_type}, {index.ntotal} vectors) and lexical index "
+          f"({len(lexical.terms)} terms) updated in {time.perf_counter() - started:.1f}s")
 
-# Save dataframe for use later
-df.to_pickle("data/qa.pkl")
 
-print("FAISS index created successfully!")
+if __name__ == "__main__":
+    main()
@@ -1,23 +1,177 @@
 # rag_qa.py
+import json
+import logging
+import os
+
 import faiss
-import pandas as pd
+import numpy as np
 from sentence_transformers import SentenceTransformer
 
-index = faiss.read_index("data/faiss_index.bin")
-df = pd.read_pickle("data/qa.pkl")
-model = SentenceTransformer("all-MiniLM-L6-v2")
+import metrics
+from answer_store import AnswerStore
+from lexical_index import LexicalIndex
+from micro_batcher import MicroBatcher
+from rag import (ANSWER_STORE_PATH, INDEX_CONFIG_PATH, INDEX_PATH, LEXICAL_INDEX_PATH, MODEL_NAME,
+                 VECTOR_IDS_PATH, VECTORS_PATH, apply_search_params)
+
+log = logging.getLogger(__name__)
+
+RAG_TOP_K = int(os.getenv("RAG_TOP_K", "5"))
+# Hits scoring below this cosine similarity are not trusted as context
+SCORE_CUTOFF = float(os.getenv("RAG_SCORE_CUTOFF", "0.40"))
+# Concurrent queries arriving within this window share one encode + search
+RAG_BATCH_WINDOW_MS = float(os.getenv("RAG_BATCH_WINDOW_MS", "4"))
+RAG_MAX_BATCH = int(os.getenv("RAG_MAX_BATCH", "32"))
+# Candidates taken from each retriever before reciprocal-rank fusion
+RAG_FUSION_CANDIDATES = int(os.getenv("RAG_FUSION_CANDIDATES", "20"))
+RRF_K = 60
+# A lexical match whose terms overlap the query this much (Jaccard) is
+# trusted as the same question, and the encoder is skipped
+RAG_LEXICAL_SKIP_OVERLAP = float(os.getenv("RAG_LEXICAL_SKIP_OVERLAP", "0.85"))
+
+index = faiss.read_index(INDEX_PATH)
+store = AnswerStore(ANSWER_STORE_PATH)
+model = SentenceTransformer(MODEL_NAME)
+
+# Built by rag.py since hybrid retrieval was added; older builds are dense-only
+lexical = LexicalIndex.load(LEXICAL_INDEX_PATH) if os.path.exists(LEXICAL_INDEX_PATH) else None
+if lexical is None:
+    log.warning("No %s; run rag.py to enable hybrid retrieval", LEXICAL_INDEX_PATH)
+# Stored question embeddings, for scoring lexical-only hits without the encoder
+_vectors = np.load(VECTORS_PATH, mmap_mode="r")
+_vector_ids = np.load(VECTOR_IDS_PATH)
+_vector_order = np.argsort(_vector_ids)
+
+with open(INDEX_CONFIG_PATH, encoding="utf-8") as f:
+    index_config = json.load(f)
+apply_search_params(
+    index,
+    nprobe=int(os.getenv("RAG_NPROBE", index_config.get("nprobe") or 0)),
+    ef_search=int(os.getenv("RAG_EF_SEARCH", index_config.get("ef_search") or 0)),
+)
+
+def _hit(row, score):
+    question, answer = store.get(row)
+    return {
+        "id": int(row),
+        "question": question,
+        "answer": answer,
+        "score": float(min(max(score, 0.0), 1.0)),
+    }
+
+def _to_hits(scores, rows):
+    # row < 0: fewer than k results (e.g. IVF with a small nprobe)
+    return [_hit(row, score) for score, row in zip(scores, rows) if row >= 0]
+
+def _stored_vectors(rows):
+    positions = _vector_order[np.searchsorted(_vector_ids, rows, sorter=_vector_order)]
+    return np.asarray(_vectors[positions], dtype="float32")
+
+def _retrieve_batch(items):
+    """
+    Serve a batch of (query, k, query_vec) requests with one encode and one search.
+    k == 0 means the caller only wants the embedding.
+    """
+    vectors = np.empty((len(items), index.d), dtype="float32")
+    to_encode = [i for i, (_, _, vec) in enumerate(items) if vec is None]
+    if to_encode:
+        with metrics.span("query_embedding"):
+            vectors[to_encode] = model.encode(
+                [items[i][0] for i in to_encode],
+                batch_size=len(to_encode),
+                convert_to_numpy=True,
+                normalize_embeddings=True,
+            )
+    for i, (_, _, vec) in enumerate(items):
+        if vec is not None:
+            vectors[i] = vec
+
+    max_k = max(k for _, k, _ in items)
+    if max_k > 0:
+        with metrics.span("faiss_search"):
+            scores, rows = index.search(vectors, max_k)
+    results = []
+    with metrics.span("answer_lookup"):
+        for i, (_, k, _) in enumerate(items):
+            hits = _to_hits(scores[i][:k], rows[i][:k]) if k > 0 else []
+            results.append((hits, vectors[i]))
+    return results
+
+_batcher = MicroBatcher(_retrieve_batch, max_batch_size=RAG_MAX_BATCH,
+                        max_wait_ms=RAG_BATCH_WINDOW_MS, name="rag-batcher")
+
+def _lexical_candidates(query, query_vec):
+    """
+    BM25 candidates for a query, and the query vector to use. When the best
+    lexical match is the same question in all but a word or two, its stored
+    embedding stands in for the query's, so the encoder is not run.
+    """
+    if lexical is None:
+        return [], query_vec
+    with metrics.span("bm25_search"):
+        rows, _, overlap = lexical.search(query, RAG_FUSION_CANDIDATES)
+    if query_vec is None and len(rows) and overlap >= RAG_LEXICAL_SKIP_OVERLAP:
+        query_vec = _stored_vectors(rows[:1])[0]
+    return rows.tolist(), query_vec
+
+def _fuse(dense_hits, lexical_rows, query_vec, k):
+    """
+    Reciprocal-rank fusion picks the k hits; they are returned by cosine
+    score, best first, like dense-only hits, since callers treat the first
+    hit's score as the best.
+    """
+    if not lexical_rows:
+        return dense_hits[:k]
+    fused = {}
+    for ranking in ([hit["id"] for hit in dense_hits], lexical_rows):
+        for rank, row in enumerate(ranking):
+            fused[row] = fused.get(row, 0.0) + 1.0 / (RRF_K + rank + 1)
+    order = sorted(fused, key=fused.get, reverse=True)[:k]
+
+    hits = {hit["id"]: hit for hit in dense_hits}
+    lexical_only = [row for row in order if row not in hits]
+    if lexical_only:
+        for row, score in zip(lexical_only, _stored_vectors(lexical_only) @ query_vec):
+            hits[row] = _hit(row, score)
+    return sorted((hits[row] for row in order), key=lambda hit: hit["score"], reverse=True)
 
-def rag_answer(query):
-    query_vec = model.encode([query], convert_to_numpy=True)
+def retrieve(query, k=RAG_TOP_K, query_vec=None):
+    """
+    Return (hits, query_vec) for a query: BM25 and dense hits fused by
+    reciprocal rank, dense part batched with concurrent callers. The
+    unit-length query_vec can be reused by caches.
+    """
+    lexical_rows, query_vec = _lexical_candidates(query, query_vec)
+    dense_hits, query_vec = _batcher((query, max(k, RAG_FUSION_CANDIDATES), query_vec))
+    return _fuse(dense_hits, lexical_rows, query_vec, k), query_vec
 
-    distances, indices = index.search(query_vec, k=1)
+def retrieve_many(queries, k=RAG_TOP_K):
+    """Retrieve for many queries at once; they are batched like concurrent callers."""
+    candidates = [_lexical_candidates(query, None) for query in queries]
+    futures = [_batcher.submit((query, max(k, RAG_FUSION_CANDIDATES), vec))
+               for query, (_, vec) in zip(queries, candidates)]
+    results = []
+    for future, (lexical_rows, _) in zip(futures, candidates):
+        dense_hits, query_vec = future.result()
+        results.append((_fuse(dense_hits, lexical_rows, query_vec, k), query_vec))
+    return results
 
-    best_index = indices[0][0]
-    best_distance = distances[0][0]
+def encode_query(query):
+    """Embed a single query as a unit vector."""
+    return _batcher((query, 0, None))[1]
 
-    # convert L2 distance to similarity score
-    score = 1 / (1 + best_distance)
+def rag_search(query, k=RAG_TOP_K, query_vec=None):
+    """
+    Return up to k hits, best first, as dicts with id, question, answer and score.
+    Ids are the stable row ids assigned by rag.py.
 
-    answer = df.iloc[best_index]["Answers"]
+    The score is the cosine similarity between query and stored question,
+    clipped to [0, 1], so one cutoff means the same thing for every query.
+    """
+    return retrieve(query, k, query_vec)[0]
 
-    return answer, score
+def rag_answer(query, query_vec=None):
+    hits = rag_search(query, k=1, query_vec=query_vec)
+    if not hits:
+        return "", 0.0
+    return hits[0]["answer"], hits[0]["score"]
@@ -0,0 +1,182 @@
+# semantic_cache.py
+import atexit
+import logging
+import os
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.92"))
+CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "1000"))
+CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", str(24 * 3600)))
+# Empty path keeps the cache in memory only
+CACHE_PATH = os.getenv("SEMANTIC_CACHE_PATH", "data/reply_cache.pkl")
+CACHE_SAVE_EVERY = int(os.getenv("SEMANTIC_CACHE_SAVE_EVERY", "20"))
+
+
+def _normalize_text(text: str) -> str:
+    return " ".join(text.lower().split())
+
+
+def _unit(vector) -> np.ndarray:
+    vec = np.asarray(vector, dtype=np.float32).reshape(-1)
+    norm = np.linalg.norm(vec)
+    return vec / norm if norm > 0 else vec
+
+
+class _Namespace:
+    """LRU-ordered entries for one language plus a lazily rebuilt vector matrix."""
+
+    def __init__(self):
+        self.entries = OrderedDict()  # normalized text -> (vector, reply, created_at)
+        self._matrix = None
+        self._keys = []
+
+    def invalidate(self):
+        self._matrix = None
+
+    def matrix(self):
+        if self._matrix is None and self.entries:
+            self._keys = list(self.entries)
+            self._matrix = np.stack([self.entries[k][0] for k in self._keys])
+        return self._matrix, self._keys
+
+
+class SemanticCache:
+    """
+    Reply cache keyed by query embedding.
+
+    A lookup hits when the normalized text was seen before, or when a stored
+    query's embedding has cosine similarity >= threshold with the new one.
+    Entries are kept per namespace (language), evicted LRU beyond max_entries
+    and dropped once older than ttl seconds.
+    """
+
+    def __init__(
+        self,
+        threshold: float = CACHE_THRESHOLD,
+        max_entries: int = CACHE_MAX_ENTRIES,
+        ttl: float = CACHE_TTL,
+        path: Optional[str] = CACHE_PATH,
+        save_every: int = CACHE_SAVE_EVERY,
+    ):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path or None
+        self.save_every = save_every
+        self.hits = 0
+        self.misses = 0
+        self._namespaces = {}
+        self._lock = threading.Lock()
+        self._unsaved = 0
+        if self.path:
+            self.load()
+            atexit.register(self.save)
+
+    def _namespace(self, name: str) -> _Namespace:
+        ns = self._namespaces.get(name)
+        if ns is None:
+            ns = self._namespaces[name] = _Namespace()
+        return ns
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.ttl > 0 and now - created_at > self.ttl
+
+    def lookup(self, namespace: str, text: str, vector=None) -> Optional[str]:
+        """Return a cached reply for this query, or None on a miss."""
+        key = _normalize_text(text)
+        now = time.time()
+        with self._lock:
+            ns = self._namespace(namespace)
+
+            match = key if key in ns.entries else None
+            if match is None and vector is not None:
+                matrix, keys = ns.matrix()
+                if matrix is not None:
+                    sims = matrix @ _unit(vector)
+                    best = int(np.argmax(sims))
+                    if sims[best] >= self.threshold:
+                        match = keys[best]
+
+            if match is not None and self._expired(ns.entries[match][2], now):
+                del ns.entries[match]
+                ns.invalidate()
+                match = None
+
+            if match is None:
+                self.misses += 1
+                return None
+            ns.entries.move_to_end(match)
+            self.hits += 1
+            return ns.entries[match][1]
+
+    def store(self, namespace: str, text: str, vector, reply: str):
+        """Remember a generated reply for this query."""
+        if not reply or vector is None:
+            return
+        key = _normalize_text(text)
+        with self._lock:
+            ns = self._namespace(namespace)
+            ns.entries[key] = (_unit(vector), reply, time.time())
+            ns.entries.move_to_end(key)
+            while len(ns.entries) > self.max_entries:
+                ns.entries.popitem(last=False)
+            ns.invalidate()
+            self._unsaved += 1
+            flush = self.path and self._unsaved >= self.save_every
+        if flush:
+            self.save()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+                "entries": {name: len(ns.entries) for name, ns in self._namespaces.items()},
+            }
+
+    def save(self):
+        """Write live entries to disk atomically."""
+        if not self.path:
+            return
+        now = time.time()
+        with self._lock:
+            snapshot = {
+                name: [(k, v) for k, v in ns.entries.items() if not self._expired(v[2], now)]
+                for name, ns in self._namespaces.items()
+            }
+            self._unsaved = 0
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        # Per-process temp file: pre-forked workers save the same cache
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(snapshot, f)
+        os.replace(tmp_path, self.path)
+
+    def load(self):
+        """Restore entries saved by a previous run, skipping expired ones."""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "rb") as f:
+                snapshot = pickle.load(f)
+        except Exception as e:
+            log.warning("Could not load reply cache: %s", e)
+            return
+        now = time.time()
+        with self._lock:
+            for name, items in snapshot.items():
+                ns = self._namespace(name)
+                for key, entry in items[-self.max_entries:]:
+                    if not self._expired(entry[2], now):
+                        ns.entries[key] = entry
+                ns.invalidate()
@@ -47,6 +47,7 @@ function addMessage(message, isUser = false) {
     chatMessages.appendChild(messageDiv);
     
     chatMessages.scrollTop = chatMessages.scrollHeight;
+    return content;
 }
 
 function addUserMessage(message) {
@@ -91,17 +92,27 @@ async function sendMessage() {
     try {
         const response = await fetch('/get_response', {
             method: 'POST',
-            headers: { 'Content-Type': 'application/json' },
+            headers: {
+                'Content-Type': 'application/json',
+                'Accept': 'text/event-stream'
+            },
             body: JSON.stringify({
                 message: message,
-                language: currentLanguage
+                language: currentLanguage,
+                stream: true
             })
         });
-        
-        const data = await response.json();
 
-        removeTypingIndicator();
-        addMessage(data.response, false);
+        const contentType = response.headers.get('Content-Type') || '';
+        if (!contentType.includes('text/event-stream') || !response.body) {
+            // Server answered with the plain JSON reply
+            const data = await response.json();
+            removeTypingIndicator();
+            addMessage(data.response, false);
+            return;
+        }
+
+        await renderStreamedReply(response);
     } catch (error) {
         removeTypingIndicator();
         const errorMessage = currentLanguage === 'english' 
@@ -111,6 +122,45 @@ async function sendMessage() {
     }
 }
 
+// Read Server-Sent Events from /get_response and grow the bot message as tokens arrive
+async function renderStreamedReply(response) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let replyText = '';
+    let content = null;
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const rawEvent = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            const dataLine = rawEvent.split('\n').find(line => line.startsWith('data:'));
+            if (!dataLine) continue;
+            const payload = JSON.parse(dataLine.slice(5));
+            if (payload.token === undefined) continue;
+
+            replyText += payload.token;
+            if (!content) {
+                removeTypingIndicator();
+                content = addMessage('', false);
+            }
+            content.innerHTML = replyText.trimStart().replace(/\n/g, '<br>');
+            chatMessages.scrollTop = chatMessages.scrollHeight;
+        }
+    }
+
+    if (!content) {
+        removeTypingIndicator();
+        addMessage("Sorry, I couldn't generate a response.", false);
+    }
+}
+
 sendBtn.addEventListener('click', sendMessage);
 userInput.addEventListener('keypress', (e) => {
     if (e.key === 'Enter') {
@@ -123,11 +173,14 @@ let isRecording = false;
 let mediaRecorder;
 let audioChunks = [];
 
+// Stream microphone audio over a WebSocket when the server supports it
+const useVoiceStreaming = window.VOICE_STREAMING_ENABLED === true && 'AudioWorkletNode' in window;
+
 voiceBtn.addEventListener('click', async () => {
     if (isRecording) {
-        stopRecording();
+        useVoiceStreaming ? stopStreamingRecording() : stopRecording();
     } else {
-        await startRecording();
+        useVoiceStreaming ? await startStreamingRecording() : await startRecording();
     }
 });
 
@@ -173,18 +226,24 @@ async function handleRecordingStop() {
     const audioBlob = new Blob(audioChunks, { type: 'audio/webm' });
     const formData = new FormData();
     formData.append('audio', audioBlob, 'voice.webm');
+    formData.append('language', currentLanguage);
 
     showTypingIndicator();
     try {
-        const response = await fetch('/voice_query', {
+        const response = await fetch('/voice_jobs', {
             method: 'POST',
             body: formData
         });
 
-        const result = await response.json();
+        const submitted = await response.json();
+        if (!response.ok || submitted.error) {
+            throw new Error(submitted.error || 'Voice processing failed');
+        }
+
+        const result = await waitForVoiceJob(submitted.status_url);
         removeTypingIndicator();
 
-        if (!response.ok || result.error) {
+        if (result.status === 'error') {
             throw new Error(result.error || 'Voice processing failed');
         }
 
@@ -202,3 +261,162 @@ async function handleRecordingStop() {
         audioChunks=[];
     }
 }
+
+// Long-poll a voice job until the server reports it finished
+async function waitForVoiceJob(statusUrl) {
+    while (true) {
+        const response = await fetch(`${statusUrl}?wait=20`);
+        const job = await response.json();
+        if (!response.ok) {
+            throw new Error(job.error || 'Voice processing failed');
+        }
+        if (job.status === 'done' || job.status === 'error') {
+            return job;
+        }
+    }
+}
+
+// ---------- Streaming voice input (WebSocket + AudioWorklet) ----------
+// The worklet converts microphone samples to 16-bit PCM; the AudioContext runs at 16 kHz
+const PCM_CAPTURE_WORKLET = `
+class PcmCapture extends AudioWorkletProcessor {
+    process(inputs) {
+        const channel = inputs[0][0];
+        if (channel) {
+            const pcm = new Int16Array(channel.length);
+            for (let i = 0; i < channel.length; i++) {
+                const s = Math.max(-1, Math.min(1, channel[i]));
+                pcm[i] = s < 0 ? s * 0x8000 : s * 0x7fff;
+            }
+            this.port.postMessage(pcm.buffer, [pcm.buffer]);
+        }
+        return true;
+    }
+}
+registerProcessor('pcm-capture', PcmCapture);
+`;
+const STREAM_CHUNK_SAMPLES = 1600;  // 100 ms per WebSocket message
+
+let voiceSocket = null;
+let audioContext = null;
+let micStream = null;
+let liveUserContent = null;
+let liveBotContent = null;
+let liveBotText = '';
+
+async function startStreamingRecording() {
+    try {
+        micStream = await navigator.mediaDevices.getUserMedia({
+            audio: { channelCount: 1, echoCancellation: true, noiseSuppression: true }
+        });
+        audioContext = new AudioContext({ sampleRate: 16000 });
+        const workletUrl = URL.createObjectURL(new Blob([PCM_CAPTURE_WORKLET], { type: 'application/javascript' }));
+        await audioContext.audioWorklet.addModule(workletUrl);
+
+        const source = audioContext.createMediaStreamSource(micStream);
+        const captureNode = new AudioWorkletNode(audioContext, 'pcm-capture');
+
+        const protocol = location.protocol === 'https:' ? 'wss' : 'ws';
+        const socket = new WebSocket(`${protocol}://${location.host}/voice_stream`);
+        socket.binaryType = 'arraybuffer';
+        socket.onopen = () => socket.send(JSON.stringify({ type: 'start', language: currentLanguage }));
+        socket.onmessage = (event) => handleVoiceEvent(JSON.parse(event.data));
+        socket.onerror = () => addBotMessage("Sorry, I couldn't process the voice message. Please try again.");
+        voiceSocket = socket;
+
+        let pending = [];
+        let pendingLength = 0;
+        captureNode.port.onmessage = (event) => {
+            const chunk = new Int16Array(event.data);
+            pending.push(chunk);
+            pendingLength += chunk.length;
+            if (pendingLength >= STREAM_CHUNK_SAMPLES && socket.readyState === WebSocket.OPEN) {
+                const merged = new Int16Array(pendingLength);
+                let offset = 0;
+                for (const part of pending) {
+                    merged.set(part, offset);
+                    offset += part.length;
+                }
+                socket.send(merged.buffer);
+                pending = [];
+                pendingLength = 0;
+            }
+        };
+        source.connect(captureNode);
+
+        isRecording = true;
+        voiceBtn.classList.add('recording');
+        voiceBtn.innerHTML = '<i class="fas fa-stop"></i>';
+        console.log("🎙 Streaming started…");
+    } catch (err) {
+        console.error("Microphone access denied:", err);
+        addBotMessage("I couldn't access your microphone. Please check permissions.");
+    }
+}
+
+function stopStreamingRecording() {
+    isRecording = false;
+    voiceBtn.classList.remove('recording');
+    voiceBtn.innerHTML = '<i class="fas fa-microphone"></i>';
+    if (micStream) micStream.getTracks().forEach(track => track.stop());
+    if (audioContext) audioContext.close();
+    micStream = null;
+    audioContext = null;
+    // Ask the server to finish whatever was said; the socket closes after the reply
+    if (voiceSocket && voiceSocket.readyState === WebSocket.OPEN) {
+        voiceSocket.send(JSON.stringify({ type: 'stop' }));
+    }
+    console.log("🛑 Streaming stopped.");
+}
+
+function renderPartialTranscript(stable, unstable) {
+    liveUserContent.textContent = stable ? `${stable} ` : '';
+    const tentative = document.createElement('em');
+    tentative.textContent = unstable;
+    liveUserContent.appendChild(tentative);
+    chatMessages.scrollTop = chatMessages.scrollHeight;
+}
+
+function handleVoiceEvent(event) {
+    switch (event.type) {
+        case 'speech_start':
+            if (!liveUserContent) liveUserContent = addMessage('…', true);
+            break;
+        case 'partial':
+            if (!liveUserContent) liveUserContent = addMessage('', true);
+            renderPartialTranscript(event.stable, event.unstable);
+            break;
+        case 'final':
+            if (event.text) {
+                if (!liveUserContent) liveUserContent = addMessage('', true);
+                liveUserContent.textContent = event.text;
+                showTypingIndicator();
+            } else if (liveUserContent) {
+                liveUserContent.closest('.message').remove();
+            }
+            liveUserContent = null;
+            break;
+        case 'token':
+            if (!liveBotContent) {
+                removeTypingIndicator();
+                liveBotContent = addMessage('', false);
+            }
+            liveBotText += event.text;
+            liveBotContent.innerHTML = liveBotText.trimStart().replace(/\n/g, '<br>');
+            chatMessages.scrollTop = chatMessages.scrollHeight;
+            break;
+        case 'done':
+            removeTypingIndicator();
+            liveBotContent = null;
+            liveBotText = '';
+            if (!isRecording && voiceSocket) {
+                voiceSocket.close();
+                voiceSocket = null;
+            }
+            break;
+        case 'error':
+            removeTypingIndicator();
+            addBotMessage(event.message || "Sorry, I couldn't process the voice message. Please try again.");
+            break;
+    }
+}
@@ -0,0 +1,209 @@
+# streaming_asr.py
+"""
+Streaming voice input: voice-activity detection, end-of-utterance
+detection and stabilised partial transcripts over a live PCM stream.
+
+The browser sends 16 kHz mono little-endian int16 PCM in small binary
+messages. A StreamingSession turns them into events for the client:
+
+    {"type": "speech_start"}
+    {"type": "partial", "stable": "...", "unstable": "..."}
+    {"type": "final", "text": "...", "language": "en", "language_confidence": 0.97}
+"""
+import logging
+import os
+from concurrent.futures import Future
+from typing import List, Optional
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+FRAME_MS = 30
+FRAME_SAMPLES = SAMPLE_RATE * FRAME_MS // 1000
+
+END_SILENCE_MS = int(os.getenv("VOICE_STREAM_END_SILENCE_MS", "700"))
+MIN_SPEECH_MS = int(os.getenv("VOICE_STREAM_MIN_SPEECH_MS", "250"))
+MAX_UTTERANCE_S = float(os.getenv("VOICE_STREAM_MAX_UTTERANCE_S", "30"))
+PARTIAL_INTERVAL_MS = int(os.getenv("VOICE_STREAM_PARTIAL_MS", "1000"))
+# Audio kept from just before speech was detected, so first syllables are not clipped
+PRE_ROLL_MS = 300
+VAD_AGGRESSIVENESS = int(os.getenv("VOICE_VAD_AGGRESSIVENESS", "2"))
+
+try:
+    import webrtcvad
+except ImportError:  # optional; fall back to the energy detector
+    webrtcvad = None
+
+
+class EnergyVAD:
+    """
+    Frame-level speech detector on RMS energy against a tracked noise floor.
+    Used when webrtcvad is not installed.
+    """
+
+    def __init__(self, ratio=3.0, min_rms=0.01):
+        self.ratio = ratio
+        self.min_rms = min_rms
+        self.noise_floor = None
+
+    def is_speech(self, frame: np.ndarray) -> bool:
+        rms = float(np.sqrt(np.mean(frame * frame))) if len(frame) else 0.0
+        if self.noise_floor is None:
+            self.noise_floor = rms
+        speech = rms > max(self.noise_floor * self.ratio, self.min_rms)
+        if not speech:
+            # Follow the background level down quickly and up slowly
+            rate = 0.5 if rms < self.noise_floor else 0.05
+            self.noise_floor += rate * (rms - self.noise_floor)
+        return speech
+
+
+class WebRtcVAD:
+    def __init__(self, aggressiveness=VAD_AGGRESSIVENESS):
+        self._vad = webrtcvad.Vad(aggressiveness)
+
+    def is_speech(self, frame: np.ndarray) -> bool:
+        pcm = (np.clip(frame, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+        return self._vad.is_speech(pcm, SAMPLE_RATE)
+
+
+def make_vad():
+    return WebRtcVAD() if webrtcvad is not None else EnergyVAD()
+
+
+def _common_word_prefix(a: List[str], b: List[str]) -> int:
+    n = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        n += 1
+    return n
+
+
+class StreamingSession:
+    """
+    One live voice stream.
+
+    feed() accepts raw PCM and returns events; poll() returns events for
+    partial transcripts that finished in the background. transcribe(audio,
+    language) must return a Future of a dict with user_text, language and
+    language_confidence (AsrPool.run_waveform fits).
+    """
+
+    def __init__(self, transcribe, language_hint=None):
+        self.transcribe = transcribe
+        self.language_hint = language_hint
+        self.vad = make_vad()
+        self._pending = np.zeros(0, dtype=np.float32)
+        self._pre_roll = []
+        self.reset()
+
+    def reset(self):
+        """Forget the current utterance and wait for the next one."""
+        self._frames = []
+        self._in_speech = False
+        self._speech_ms = 0
+        self._silence_ms = 0
+        self._since_partial_ms = 0
+        self._partial: Optional[Future] = None
+        self._language = None
+        self._previous_words: List[str] = []
+        self._stable_words: List[str] = []
+
+    @property
+    def utterance_ms(self):
+        return len(self._frames) * FRAME_MS
+
+    def _audio(self):
+        return np.concatenate(self._frames) if self._frames else np.zeros(0, dtype=np.float32)
+
+    def feed(self, pcm: bytes) -> List[dict]:
+        """Consume int16 PCM; returns events, ending with 'final' at end of utterance."""
+        samples = np.frombuffer(pcm, dtype="<i2").astype(np.float32) / 32768.0
+        self._pending = np.concatenate([self._pending, samples])
+        events = []
+        while len(self._pending) >= FRAME_SAMPLES:
+            frame, self._pending = self._pending[:FRAME_SAMPLES], self._pending[FRAME_SAMPLES:]
+            events += self._frame(frame)
+            if events and events[-1]["type"] == "final":
+                break
+        return events
+
+    def _frame(self, frame) -> List[dict]:
+        speech = self.vad.is_speech(frame)
+        if not self._in_speech:
+            self._pre_roll = (self._pre_roll + [frame])[-(PRE_ROLL_MS // FRAME_MS):]
+            if not speech:
+                return []
+            self._in_speech = True
+            self._frames = list(self._pre_roll)
+            self._pre_roll = []
+            return [{"type": "speech_start"}]
+
+        self._frames.append(frame)
+        if speech:
+            self._speech_ms += FRAME_MS
+            self._silence_ms = 0
+        else:
+            self._silence_ms += FRAME_MS
+        self._since_partial_ms += FRAME_MS
+
+        ended = (self._silence_ms >= END_SILENCE_MS and self._speech_ms >= MIN_SPEECH_MS)
+        if ended or self.utterance_ms >= MAX_UTTERANCE_S * 1000:
+            return [self.finish()]
+        if self._silence_ms >= END_SILENCE_MS:
+            # Too short to be an utterance (a click or a cough): drop it
+            self.reset()
+            return []
+        if self._since_partial_ms >= PARTIAL_INTERVAL_MS and self._partial is None:
+            self._start_partial()
+        return []
+
+    def _start_partial(self):
+        self._since_partial_ms = 0
+        try:
+            self._partial = self.transcribe(self._audio(), self.language_hint, self._language)
+        except Exception as e:
+            # Partials are best effort (e.g. the ASR queue is full)
+            log.debug("Skipping partial transcript: %s", e)
+
+    def poll(self) -> List[dict]:
+        """Events for a partial transcript that has finished since the last call."""
+        if self._partial is None or not self._partial.done():
+            return []
+        future, self._partial = self._partial, None
+        try:
+            result = future.result()
+        except Exception as e:
+            log.warning("Partial transcript failed: %s", e)
+            return []
+        # Keep the language of the first confident partial for later ones
+        if self._language is None and result.get("language_confidence", 0) >= 0.8:
+            self._language = result["language"]
+
+        # Local agreement: words two consecutive hypotheses share are committed
+        words = result.get("user_text", "").split()
+        agreed = _common_word_prefix(words, self._previous_words)
+        if agreed > len(self._stable_words):
+            self._stable_words = words[:agreed]
+        self._previous_words = words
+        unstable = words[len(self._stable_words):] if words[:len(self._stable_words)] == self._stable_words else words
+        return [{"type": "partial", "stable": " ".join(self._stable_words), "unstable": " ".join(unstable)}]
+
+    def finish(self) -> dict:
+        """Transcribe the whole utterance (blocking) and reset for the next one."""
+        audio = self._audio()
+        if self._partial is not None:
+            self._partial.cancel()
+        self.reset()
+        if not len(audio):
+            return {"type": "final", "text": ""}
+        result = self.transcribe(audio, self.language_hint, None).result()
+        return {
+            "type": "final",
+            "text": result.get("user_text", ""),
+            "language": result.get("language"),
+            "language_confidence": result.get("language_confidence"),
+        }
@@ -1,13 +1,47 @@
 # transcribe_module.py
+import logging
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
 import whisper
 import torch
-import torchaudio
 from transformers import Wav2Vec2Processor, Wav2Vec2ForCTC
 
+import metrics
+from audio_io import SAMPLE_RATE, decode_audio
+
+log = logging.getLogger(__name__)
+
+# Opt-in CPU speed-up: "int8" applies dynamic int8 quantization to the Linear
+# layers of both models (about 4x less weight memory, faster matmuls, a small
+# accuracy cost). Compare with `python -m benchmarks.asr` before enabling.
+ASR_QUANTIZE = os.getenv("ASR_QUANTIZE", "none").lower()
+if ASR_QUANTIZE not in ("none", "int8"):
+    raise ValueError(f"ASR_QUANTIZE must be 'none' or 'int8', not {ASR_QUANTIZE!r}")
+
+def _quantize(model):
+    """Return the model unchanged, or with int8 dynamic-quantized Linear layers."""
+    if ASR_QUANTIZE == "none":
+        return model
+    if next(model.parameters()).device.type != "cpu":
+        log.warning("ASR_QUANTIZE only applies to CPU models; keeping full precision")
+        return model
+    # Whisper uses its own Linear subclass, which quantize_dynamic skips:
+    # swap in plain nn.Linear layers that share the same weights first
+    for parent in list(model.modules()):
+        for name, child in parent.named_children():
+            if isinstance(child, torch.nn.Linear) and type(child) is not torch.nn.Linear:
+                plain = torch.nn.Linear(child.in_features, child.out_features, bias=child.bias is not None)
+                plain.weight = child.weight
+                plain.bias = child.bias
+                setattr(parent, name, plain)
+    return torch.ao.quantization.quantize_dynamic(model.eval(), {torch.nn.Linear}, dtype=torch.qint8)
+
 # ---------- Load models ONCE at import time ----------
-print("Loading Whisper model (small) ...")
-WHISPER_MODEL = whisper.load_model("small")  # consider "base" for speed or "small" for accuracy
+log.info("Loading Whisper model (small, %s) ...", ASR_QUANTIZE)
+WHISPER_MODEL = _quantize(whisper.load_model("small"))  # consider "base" for speed or "small" for accuracy
 
 # Lazy-load Nepali HF model only if needed (we'll initialize to None)
 HF_NEPALI_MODEL = None
@@ -17,52 +51,180 @@ HF_NEPALI_NAME = "iamTangsang/Wav2Vec2_XLS-R-300m_Nepali_ASR"
 def _ensure_nepali_model_loaded():
     global HF_NEPALI_MODEL, HF_NEPALI_PROCESSOR
     if HF_NEPALI_MODEL is None or HF_NEPALI_PROCESSOR is None:
-        print("Loading Nepali HuggingFace model ...")
+        log.info("Loading Nepali HuggingFace model ...")
         HF_NEPALI_PROCESSOR = Wav2Vec2Processor.from_pretrained(HF_NEPALI_NAME)
-        HF_NEPALI_MODEL = Wav2Vec2ForCTC.from_pretrained(HF_NEPALI_NAME)
+        HF_NEPALI_MODEL = _quantize(Wav2Vec2ForCTC.from_pretrained(HF_NEPALI_NAME))
 
-def transcribe_audio(wav_path: str) -> (str, str):
+def load_all_models():
+    """Load the Nepali model now instead of on first use, e.g. before forking workers."""
+    _ensure_nepali_model_loaded()
+
+# Whisper's decoder installs kv-cache hooks on the shared model for each
+# decode, so calls from several threads (ASR_EXECUTOR=thread) take turns
+_whisper_lock = threading.Lock()
+
+# Below this probability the English/non-English decision is treated as borderline
+LANG_MIN_CONFIDENCE = float(os.getenv("ASR_LANG_MIN_CONFIDENCE", "0.6"))
+
+@metrics.timed("language_detect")
+def detect_language(audio) -> (str, float, float):
     """
-    Returns: (transcription_text, detected_language_code)
-    detected_language_code is e.g. "en" or "ne" (or whisper's reported language)
+    Classify the spoken language from the first 30 s log-mel window only.
+
+    Returns (language_code, confidence, english_probability). No text is
+    decoded here, so the clip is transcribed exactly once afterwards.
     """
-    if not os.path.exists(wav_path):
-        raise FileNotFoundError(f"Audio file not found: {wav_path}")
+    segment = whisper.pad_or_trim(audio)
+    mel = whisper.log_mel_spectrogram(segment, n_mels=WHISPER_MODEL.dims.n_mels).to(WHISPER_MODEL.device)
+    with _whisper_lock:
+        _, probs = WHISPER_MODEL.detect_language(mel)
+    language = max(probs, key=probs.get)
+    return language, float(probs[language]), float(probs.get("en", 0.0))
+
+def _route_language(detected_lang: str, english_prob: float, language_hint=None) -> (bool, float):
+    """
+    Decide between the English (Whisper) and Nepali (wav2vec2) paths.
+    Returns (use_english, confidence_in_that_choice). Borderline clips
+    follow the language the user selected in the UI, when we know it.
+    """
+    use_english = detected_lang.startswith("en")
+    confidence = english_prob if use_english else 1.0 - english_prob
+    if confidence < LANG_MIN_CONFIDENCE and language_hint:
+        use_english = not str(language_hint).lower().startswith("ne")
+        confidence = english_prob if use_english else 1.0 - english_prob
+    return use_english, confidence
+
+# Long clips are cut into windows so peak memory does not grow with clip
+# length (wav2vec2 attention is quadratic in the input length)
+ASR_CHUNK_S = float(os.getenv("ASR_CHUNK_S", "20"))
+# Extra audio on each side of a wav2vec2 window whose logits are thrown away,
+# so words at the window edges are recognised with full context
+ASR_CHUNK_STRIDE_S = float(os.getenv("ASR_CHUNK_STRIDE_S", "2.5"))
+# wav2vec2 windows run at once; >1 spreads one long clip over more cores
+ASR_CHUNK_WORKERS = int(os.getenv("ASR_CHUNK_WORKERS", "1"))
+WHISPER_WINDOW_S = whisper.audio.CHUNK_LENGTH
+# Whisper windows are cut at the quietest point in this last stretch of each window
+WHISPER_CUT_SEARCH_S = 5
+
+_chunk_executor = None
+_chunk_executor_lock = threading.Lock()
+
+def _map_windows(fn, items):
+    """map() over windows, on the chunk thread pool when ASR_CHUNK_WORKERS > 1."""
+    global _chunk_executor
+    if ASR_CHUNK_WORKERS <= 1 or len(items) <= 1:
+        return map(fn, items)
+    with _chunk_executor_lock:
+        if _chunk_executor is None:
+            _chunk_executor = ThreadPoolExecutor(ASR_CHUNK_WORKERS, thread_name_prefix="asr-chunk")
+    return _chunk_executor.map(fn, items)
+
+def _ctc_windows(n_samples):
+    """(start, end, left_context, right_context) in samples for each wav2vec2 window."""
+    chunk = int(ASR_CHUNK_S * SAMPLE_RATE)
+    stride = int(ASR_CHUNK_STRIDE_S * SAMPLE_RATE)
+    if chunk <= 0 or n_samples <= chunk + stride:
+        return [(0, n_samples, 0, 0)]
+    windows = []
+    for start in range(0, n_samples, chunk):
+        end = min(start + chunk, n_samples)
+        lo, hi = max(0, start - stride), min(n_samples, end + stride)
+        windows.append((lo, hi, start - lo, hi - end))
+    return windows
 
-    # Use Whisper to detect language first
-    detected = WHISPER_MODEL.transcribe(wav_path, task="transcribe")
-    detected_lang = detected.get("language", "unknown")
-    # Whisper may return language codes like 'ne' or 'english' depending on versions;
-    # normalize to lower-case
-    detected_lang = str(detected_lang).lower()
+def _nepali_window_ids(window):
+    """Greedy CTC ids for one window, with the context frames on either side dropped."""
+    segment, left, right = window
+    inputs = HF_NEPALI_PROCESSOR(segment, sampling_rate=SAMPLE_RATE, return_tensors="pt")
+    with torch.no_grad():
+        logits = HF_NEPALI_MODEL(**inputs).logits[0]
+    samples_per_frame = len(segment) / logits.shape[0]
+    first = int(round(left / samples_per_frame))
+    last = logits.shape[0] - int(round(right / samples_per_frame))
+    return torch.argmax(logits[first:last], dim=-1)
+
+def _transcribe_nepali(audio) -> str:
+    """
+    Sliding-window CTC: each window's logits are trimmed to its own span and
+    the frame ids are stitched before decoding, so repeats and blanks across
+    window edges collapse exactly as in a single pass.
+    """
+    _ensure_nepali_model_loaded()
+    with metrics.span("wav2vec2"):
+        windows = [(audio[lo:hi], left, right) for lo, hi, left, right in _ctc_windows(len(audio))]
+        ids = torch.cat(list(_map_windows(_nepali_window_ids, windows)))
+        return HF_NEPALI_PROCESSOR.batch_decode(ids.unsqueeze(0))[0].strip()
+
+def _whisper_segments(audio):
+    """Split clips longer than one Whisper window at low-energy points."""
+    window = WHISPER_WINDOW_S * SAMPLE_RATE
+    search = WHISPER_CUT_SEARCH_S * SAMPLE_RATE
+    frame = SAMPLE_RATE // 50  # 20 ms
+    segments, start = [], 0
+    while len(audio) - start > window:
+        region = audio[start + window - search:start + window]
+        energy = np.square(region[:len(region) // frame * frame].reshape(-1, frame)).mean(axis=1)
+        cut = start + window - search + int(np.argmin(energy)) * frame
+        segments.append(audio[start:cut])
+        start = cut
+    segments.append(audio[start:])
+    return segments
+
+@metrics.timed("whisper")
+def _transcribe_whisper(audio, language) -> str:
+    segments = _whisper_segments(audio)
+    with _whisper_lock:
+        if len(segments) == 1:
+            return WHISPER_MODEL.transcribe(audio, language=language).get("text", "").strip()
+        # Sequential on purpose: two windows cannot decode at once either
+        texts = [WHISPER_MODEL.transcribe(segment, language=language, condition_on_previous_text=False)
+                 .get("text", "").strip() for segment in segments]
+    return " ".join(text for text in texts if text)
+
+def transcribe_waveform(audio, language_hint=None, language=None) -> (str, str, float):
+    """
+    Transcribe a 16 kHz mono float32 numpy array.
+    Returns: (transcription_text, detected_language_code, language_confidence)
+
+    Pass language ("en"/"ne") to skip detection, e.g. for repeated partial
+    transcripts of a clip whose language is already known.
+    """
+    if language is None:
+        detected_lang, _, english_prob = detect_language(audio)
+        use_english, confidence = _route_language(detected_lang, english_prob, language_hint)
+    else:
+        detected_lang = language
+        use_english, confidence = language.startswith("en"), 1.0
 
     # If English -> use Whisper transcription (fast path)
-    if detected_lang.startswith("en"):
-        res = WHISPER_MODEL.transcribe(wav_path, language="en")
-        text = res.get("text", "").strip()
-        return text, "en"
+    if use_english:
+        return _transcribe_whisper(audio, "en"), "en", confidence
 
     # Otherwise, use the Nepali HF model (or fallback to Whisper's text if needed)
     try:
-        _ensure_nepali_model_loaded()
-        speech_array, sampling_rate = torchaudio.load(wav_path)
-        # Convert to mono
-        if speech_array.shape[0] > 1:
-            speech_array = torch.mean(speech_array, dim=0, keepdim=True)
-        speech = speech_array.squeeze()
-
-        if sampling_rate != 16000:
-            resampler = torchaudio.transforms.Resample(sampling_rate, 16000)
-            speech = resampler(speech)
-
-        inputs = HF_NEPALI_PROCESSOR(speech, sampling_rate=16000, return_tensors="pt", padding=True)
-        with torch.no_grad():
-            logits = HF_NEPALI_MODEL(**inputs).logits
-
-        predicted_ids = torch.argmax(logits, dim=-1)
-        transcription = HF_NEPALI_PROCESSOR.batch_decode(predicted_ids)[0].strip()
-        return transcription, "ne"
+        return _transcribe_nepali(audio), "ne", confidence
     except Exception as e:
-        # Fallback: return Whisper text if HF model fails
-        fallback = detected.get("text", "").strip()
-        return fallback, detected_lang
+        # Fallback: transcribe with Whisper if the HF model fails
+        log.warning("Nepali model failed, falling back to Whisper: %s", e)
+        fallback_lang = detected_lang if not detected_lang.startswith("en") else "ne"
+        fallback = _transcribe_whisper(audio, fallback_lang)
+        return fallback, fallback_lang, confidence
+
+def transcribe_bytes(data: bytes, language_hint=None) -> (str, str, float):
+    """
+    Transcribe an uploaded clip straight from memory.
+    Returns: (transcription_text, detected_language_code, language_confidence)
+    """
+    # Decode once (16 kHz mono) and reuse the samples for every model
+    return transcribe_waveform(decode_audio(data), language_hint)
+
+def transcribe_audio(wav_path: str, language_hint=None) -> (str, str, float):
+    """
+    Returns: (transcription_text, detected_language_code, language_confidence)
+    detected_language_code is e.g. "en" or "ne" (or whisper's reported language)
+    """
+    if not os.path.exists(wav_path):
+        raise FileNotFoundError(f"Audio file not found: {wav_path}")
+
+    with open(wav_path, "rb") as f:
+        return transcribe_bytes(f.read(), language_hint)
@@ -0,0 +1,180 @@
+# user_store.py
+"""
+Accounts in SQLite, so they survive restarts and every worker process sees
+the same users.
+
+The database runs in WAL mode: logins (reads) never wait for a signup
+(write), and concurrent writers queue on busy_timeout instead of failing.
+Connections are pooled per process. PBKDF2 hashing runs on a small bounded
+executor: a burst of logins waits there, or is turned away with
+AuthBusyError, instead of tying up every request thread on hashing.
+"""
+import os
+import queue
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+USERS_DB_PATH = os.getenv("USERS_DB_PATH", "data/users.db")
+USERS_DB_POOL_SIZE = int(os.getenv("USERS_DB_POOL_SIZE", "8"))
+# Password hashes computed at once, and how many more may wait for a turn
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_QUEUE = int(os.getenv("PASSWORD_HASH_QUEUE", "16"))
+PASSWORD_HASH_TIMEOUT = float(os.getenv("PASSWORD_HASH_TIMEOUT", "10"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    username      TEXT PRIMARY KEY,
+    password_hash TEXT,
+    email         TEXT,
+    name          TEXT,
+    provider      TEXT NOT NULL DEFAULT 'local',
+    created_at    REAL NOT NULL,
+    updated_at    REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS users_email ON users (email);
+"""
+_FIELDS = ("username", "password_hash", "email", "name", "provider")
+
+
+class UserExistsError(ValueError):
+    """Raised when signing up with a username that is taken."""
+
+
+class AuthBusyError(RuntimeError):
+    """Raised when too many password checks are already queued."""
+
+
+class UserStore:
+    def __init__(self, path=USERS_DB_PATH, pool_size=USERS_DB_POOL_SIZE,
+                 hash_workers=PASSWORD_HASH_WORKERS, hash_queue=PASSWORD_HASH_QUEUE,
+                 hash_timeout=PASSWORD_HASH_TIMEOUT):
+        self.path = path
+        self.pool_size = max(1, pool_size)
+        self.hash_workers = max(1, hash_workers)
+        self.hash_timeout = hash_timeout
+        self._hash_slots_total = self.hash_workers + max(0, hash_queue)
+        self._pid = None
+        self._reset_lock = threading.Lock()
+        self._reset_for_process()
+        with self._connection() as conn:
+            conn.executescript(SCHEMA)
+
+    def _reset_for_process(self):
+        """
+        Per-process state. SQLite connections and executor threads must not
+        cross a fork, so a pre-forked worker starts with fresh ones.
+        """
+        self._pool = queue.LifoQueue(maxsize=self.pool_size)
+        self._hash_executor = ThreadPoolExecutor(max_workers=self.hash_workers, thread_name_prefix="pwhash")
+        self._hash_slots = threading.BoundedSemaphore(self._hash_slots_total)
+        self._pid = os.getpid()
+
+    def _check_process(self):
+        if self._pid != os.getpid():
+            with self._reset_lock:
+                if self._pid != os.getpid():
+                    self._reset_for_process()
+
+    def _connect(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        # autocommit; check_same_thread=False because pooled connections move between request threads
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def _connection(self):
+        self._check_process()
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            yield conn
+        finally:
+            try:
+                self._pool.put_nowait(conn)
+            except queue.Full:
+                conn.close()
+
+    def _hash_call(self, fn, *args):
+        """Run a password hash function on the bounded executor."""
+        self._check_process()
+        if not self._hash_slots.acquire(blocking=False):
+            raise AuthBusyError("Too many sign-ins in progress")
+        try:
+            future = self._hash_executor.submit(fn, *args)
+        except Exception:
+            self._hash_slots.release()
+            raise
+        future.add_done_callback(lambda _: self._hash_slots.release())
+        try:
+            return future.result(timeout=self.hash_timeout)
+        except FutureTimeoutError:
+            raise AuthBusyError(f"Password check not done within {self.hash_timeout:.0f}s") from None
+
+    def get(self, username):
+        """The user's record as a dict, or None."""
+        with self._connection() as conn:
+            row = conn.execute(f"SELECT {', '.join(_FIELDS)} FROM users WHERE username = ?",
+                               (username,)).fetchone()
+        return dict(row) if row else None
+
+    def get_by_email(self, email):
+        """The first account registered with this email, or None."""
+        if not email:
+            return None
+        with self._connection() as conn:
+            row = conn.execute(f"SELECT {', '.join(_FIELDS)} FROM users WHERE email = ? ORDER BY created_at LIMIT 1",
+                               (email,)).fetchone()
+        return dict(row) if row else None
+
+    def exists(self, username):
+        with self._connection() as conn:
+            return conn.execute("SELECT 1 FROM users WHERE username = ?", (username,)).fetchone() is not None
+
+    def create_local(self, username, password):
+        """Add a username/password account; raises UserExistsError if the name is taken."""
+        if self.exists(username):
+            raise UserExistsError(username)
+        password_hash = self._hash_call(generate_password_hash, password)
+        now = time.time()
+        try:
+            with self._connection() as conn:
+                conn.execute(
+                    "INSERT INTO users (username, password_hash, email, name, provider, created_at, updated_at)"
+                    " VALUES (?, ?, NULL, ?, 'local', ?, ?)",
+                    (username, password_hash, username, now, now),
+                )
+        except sqlite3.IntegrityError:
+            # Signed up from another thread or worker since the check above
+            raise UserExistsError(username) from None
+
+    def authenticate(self, username, password):
+        """The user's record if the password matches, else None."""
+        user = self.get(username)
+        if not user or not user["password_hash"]:
+            return None
+        if not self._hash_call(check_password_hash, user["password_hash"], password):
+            return None
+        return user
+
+    def upsert_google(self, username, email, name):
+        """Create or update the account for a Google sign-in and return it."""
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT INTO users (username, password_hash, email, name, provider, created_at, updated_at)"
+                " VALUES (?, NULL, ?, ?, 'google', ?, ?)"
+                " ON CONFLICT (username) DO UPDATE SET"
+                " email = excluded.email, name = excluded.name, provider = 'google', updated_at = excluded.updated_at",
+                (username, email, name, now, now),
+            )
+        return self.get(username)
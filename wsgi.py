@@ -0,0 +1,76 @@
+# wsgi.py
+"""
+Production entry point, pre-forked by gunicorn (see gunicorn.conf.py).
+
+The master imports the app and loads its tier's models before forking, so
+every worker shares the FAISS index, MiniLM and, in the voice tier, Whisper
+and wav2vec2 copy-on-write instead of holding its own copy. Two tiers run
+as separate gunicorn instances with their own worker counts:
+
+  text   chat, retrieval and auth pages; RAG stack only
+  voice  /voice_query, /voice_jobs and /voice_stream; RAG plus speech models
+
+Voice workers run ASR on threads (ASR_EXECUTOR=thread) over the shared
+models; a separate process pool would load its own copies again.
+"""
+import gc
+import logging
+import os
+import sys
+
+FAMILYCARE_TIER = os.getenv("FAMILYCARE_TIER", "text")
+if FAMILYCARE_TIER not in ("text", "voice"):
+    raise ValueError(f"FAMILYCARE_TIER must be 'text' or 'voice', not {FAMILYCARE_TIER!r}")
+# torch intra-op threads per worker; the workers already use the cores in parallel
+WORKER_TORCH_THREADS = int(os.getenv("WORKER_TORCH_THREADS", "1"))
+
+if FAMILYCARE_TIER == "voice":
+    os.environ.setdefault("ASR_EXECUTOR", "thread")
+    # Concurrency comes from the workers; Whisper runs one clip at a time per process anyway
+    os.environ.setdefault("ASR_POOL_SIZE", "1")
+    os.environ.setdefault("FAMILYCARE_READY_REQUIRES", "rag,asr")
+    # The thread-mode ASR pool sets torch's threads for the whole process when it loads
+    os.environ.setdefault("ASR_TORCH_THREADS", str(WORKER_TORCH_THREADS))
+    # A /voice_jobs poll may reach a worker other than the one running the job
+    os.environ.setdefault("ASR_JOBS_DB", "data/voice_jobs.db")
+# Models are loaded synchronously below; background loader threads would not survive the fork
+os.environ["FAMILYCARE_PRELOAD"] = ""
+
+# Objects created from here on are frozen before the fork; keeping the
+# collector off until then stops it touching (and so copying) their pages
+gc.disable()
+
+import metrics  # noqa: E402
+from app import COMPONENTS, app, timed_import  # noqa: E402,F401
+
+log = logging.getLogger("familycare.wsgi")
+
+
+def load_shared_models():
+    """Load the tier's read-only models in this (master) process."""
+    COMPONENTS["rag"].get()
+    if FAMILYCARE_TIER == "voice":
+        # Only the models: the ASR pool's threads are started in each worker
+        timed_import("transcribe_module").load_all_models()
+    gc.freeze()
+    log.info("%s tier models loaded before fork; master %s", FAMILYCARE_TIER, memory_summary())
+
+
+def init_worker():
+    """Runs in each worker right after the fork."""
+    gc.enable()
+    if "torch" in sys.modules:
+        import torch
+        torch.set_num_threads(WORKER_TORCH_THREADS)
+    if FAMILYCARE_TIER == "voice":
+        COMPONENTS["asr"].load_in_background()
+
+
+def memory_summary(pid="self"):
+    memory = metrics.process_memory(pid)
+    if not memory:
+        return "memory unavailable"
+    return ", ".join(f"{kind} {value / 2**20:.0f} MB" for kind, value in memory.items())
+
+
+load_shared_models()